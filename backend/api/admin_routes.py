@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db.session import get_db
+from fastapi.concurrency import run_in_threadpool
+from backend.services import model_registry
+from backend.services.embedding_service import query_embedding_cache
+from backend.services.embedding_batcher import embedding_batcher
+from backend.services.embedding_backfill import backfill_embeddings
+from backend.services.vector_search_service import compare_storage_modes
+from backend.services.faiss_index_service import plan_index
+from backend.services.plan_catalog import plan_catalog
+from backend.services import vector_index_service
+from backend.services.vector_search_service import vector_storage_mode
+from backend.schemas.admin import VectorReportRequest
+from backend.services.llm_cache_service import cache_stats
+from backend.services.llm_client import llm_stats
+from backend.utils.requirement_parser import parser_stats
+from backend.services.filter_explain_service import explain_filter_shapes
+
+router = APIRouter()
+
+@router.get("/model")
+async def get_model_stats():
+    return model_registry.get_model_stats()
+
+@router.post("/model/warmup")
+async def warm_up_model():
+    return await run_in_threadpool(model_registry.warm_up)
+
+@router.get("/embedding-cache")
+async def get_embedding_cache_stats():
+    return query_embedding_cache.stats()
+
+@router.get("/embedding-batcher")
+async def get_embedding_batcher_stats():
+    return embedding_batcher.stats()
+
+@router.post("/embeddings/backfill")
+async def run_embedding_backfill(batch_size: int = 500, after_id: int = 0, db: AsyncSession = Depends(get_db)):
+    return await backfill_embeddings(db, batch_size=batch_size, after_id=after_id)
+
+@router.post("/vector-storage/report")
+async def vector_storage_report(req: VectorReportRequest, db: AsyncSession = Depends(get_db)):
+    return await compare_storage_modes(db, req.queries, req.k)
+
+@router.post("/model/parity")
+async def check_model_parity():
+    return await run_in_threadpool(model_registry.check_parity)
+
+@router.get("/faiss-index")
+async def get_faiss_index_stats():
+    return plan_index.stats()
+
+@router.post("/faiss-index/rebuild")
+async def rebuild_faiss_index(db: AsyncSession = Depends(get_db)):
+    await plan_index.rebuild(db)
+    return plan_index.stats()
+
+@router.get("/plan-catalog")
+async def get_plan_catalog_stats():
+    return plan_catalog.stats()
+
+@router.post("/plan-catalog/rebuild")
+async def rebuild_plan_catalog(db: AsyncSession = Depends(get_db)):
+    await plan_catalog.rebuild(db)
+    return plan_catalog.stats()
+
+@router.get("/vector-index")
+async def get_vector_index_status(db: AsyncSession = Depends(get_db)):
+    return await vector_index_service.index_status(db)
+
+@router.post("/vector-index")
+async def build_vector_index(method: str = None, mode: str = None, rebuild: bool = False):
+    mode = mode or vector_storage_mode
+    if mode not in vector_index_service.INDEXED_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown storage mode '{mode}', expected one of {sorted(vector_index_service.INDEXED_COLUMNS)}")
+    if method is not None and method not in vector_index_service.VECTOR_INDEX_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown index method '{method}', expected one of {list(vector_index_service.VECTOR_INDEX_METHODS)}")
+    return await vector_index_service.ensure_vector_index(mode, method, rebuild)
+
+@router.get("/llm-cache")
+async def get_llm_cache_stats():
+    return cache_stats()
+
+@router.get("/llm")
+async def get_llm_stats():
+    return llm_stats()
+
+@router.get("/requirement-parser")
+async def get_requirement_parser_stats():
+    # How often the rule-based parser answered without an LLM call, per prompt it stands in for
+    return parser_stats()
+
+@router.get("/filter-plans")
+async def get_filter_plans(analyze: bool = False, db: AsyncSession = Depends(get_db)):
+    # Query plans for the common structured filter shapes, to check the filter indexes are used
+    return await explain_filter_shapes(db, analyze)
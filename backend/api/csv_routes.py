@@ -1,15 +1,31 @@
-from fastapi import APIRouter, UploadFile, File, Depends, Request
+from fastapi import APIRouter, UploadFile, File, Depends, Request, HTTPException, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from backend.services import csv_service, provider_name_service
+from backend.services import csv_service, provider_name_service, catalog_metadata_service
+from backend.services.vector_search_service import refresh_after_catalog_change, refresh_vector_index
 from backend.db.session import get_db
 
 router = APIRouter()
 
 @router.post("/upload")
-async def upload_csv(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
-    row_count = await csv_service.store_csv_to_db(file, db)
-    return {"message": f"Uploaded {row_count} rows."}
+async def upload_csv(background_tasks: BackgroundTasks, file: UploadFile = File(...), mode: str = "replace", db: AsyncSession = Depends(get_db)):
+    # mode=replace reloads the whole catalog, mode=diff only touches plans that changed
+    if mode not in ("replace", "diff"):
+        raise HTTPException(status_code=400, detail="mode must be 'replace' or 'diff'")
+    summary = await csv_service.store_csv_to_db(file, db, mode)
+    await refresh_after_catalog_change(db)
+    # Index (re)builds run after the response; progress is at /api/admin/vector-index
+    background_tasks.add_task(refresh_vector_index, after_reload=mode == "replace")
+    return {
+        "message": f"Uploaded {summary['rows']} rows.",
+        "reused_embeddings": summary["reused"],
+        "encoded_embeddings": summary["encoded"],
+        "changes": {field: summary[field] for field in ("inserted", "updated", "unchanged", "deleted") if field in summary},
+    }
 
 @router.get("/providers")
 async def get_providers(db: AsyncSession = Depends(get_db)):
     return await provider_name_service.get_unique_providers(db)
+
+@router.get("/metadata")
+async def get_catalog_metadata(db: AsyncSession = Depends(get_db)):
+    return await catalog_metadata_service.get_catalog_metadata(db)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.db.session import get_db
-from backend.services.query_service import query_model
+from backend.services.query_service import query_model, retrieve_context, stream_answer
 from backend.schemas.query import QueryRequest
 router = APIRouter()
 
@@ -14,3 +15,17 @@ async def query_phone_plans(req: QueryRequest, db: AsyncSession = Depends(get_db
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     return response
+
+
+@router.post("/query/stream")
+async def stream_phone_plans(req: QueryRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Same as /query, but as server-sent events: matching plans first, then answer tokens as they are generated.
+    """
+    try:
+        retrieval = await retrieve_context(db, req, k=5)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(stream_answer(retrieval, req), media_type="text/event-stream")
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.schemas.message import MessageCreate
 from backend.db.session import get_db
-from backend.services.wechat_service import process_message, get_wechat_history
+from backend.services.wechat_service import process_message, stream_message, get_wechat_history
 
 router = APIRouter()
 
@@ -15,6 +16,12 @@ async def receive_wechat_message(payload: MessageCreate, db: AsyncSession = Depe
         raise HTTPException(status_code=500, detail=f"Failed to store message: {str(e)}")
 
 
+@router.post("/wechat/message/stream")
+async def stream_wechat_message(payload: MessageCreate, db: AsyncSession = Depends(get_db)):
+    events = await stream_message(payload, db)
+    return StreamingResponse(events, media_type="text/event-stream")
+
+
 @router.get("/wechat/{openid}/messages")
 async def get_message_history(openid: str, db: AsyncSession = Depends(get_db)):
     try:
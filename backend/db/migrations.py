@@ -0,0 +1,79 @@
+import asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from backend.db.base import Base
+# Registers every table on Base for create_all
+from backend.models import cache_models, csv_row, sales_models  # noqa: F401
+from backend.utils.countries import normalize_roaming
+
+# Idempotent DDL for columns/indexes added after a table already existed.
+# create_all only creates missing tables, so existing databases pick up changes from here.
+SCHEMA_UPGRADES = [
+    "ALTER TABLE phone_plans_db ADD COLUMN IF NOT EXISTS text_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_phone_plans_db_text_hash ON phone_plans_db (text_hash)",
+    "ALTER TABLE phone_plans_db ADD COLUMN IF NOT EXISTS embedding_half halfvec(384) "
+    "GENERATED ALWAYS AS (embedding::halfvec(384)) STORED",
+    "ALTER TABLE phone_plans_db ADD COLUMN IF NOT EXISTS embedding_bit bit(384) "
+    "GENERATED ALWAYS AS (binary_quantize(embedding)::bit(384)) STORED",
+    "ALTER TABLE phone_plans_db ADD COLUMN IF NOT EXISTS roaming_normalized VARCHAR[]",
+    "CREATE INDEX IF NOT EXISTS ix_phone_plans_db_roaming_normalized ON phone_plans_db USING gin (roaming_normalized)",
+    "CREATE INDEX IF NOT EXISTS ix_phone_plans_db_price_data ON phone_plans_db (promotion_price, data)",
+    "CREATE INDEX IF NOT EXISTS ix_phone_plans_db_provider_lower ON phone_plans_db (lower(provider))",
+    "CREATE INDEX IF NOT EXISTS ix_phone_plans_db_byod_price_data ON phone_plans_db (promotion_price, data) "
+    "WHERE byod_or_term = true",
+    # Keep the newest requirements row per search before making (user_id, search_id) unique
+    "DELETE FROM sales_user_requirements a USING sales_user_requirements b "
+    "WHERE a.user_id = b.user_id AND a.search_id = b.search_id AND a.id < b.id",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_sales_user_requirements_user_search "
+    "ON sales_user_requirements (user_id, search_id)",
+]
+
+
+async def backfill_roaming_normalized(conn: AsyncConnection):
+    """
+    Fill roaming_normalized for rows stored before the column existed, and redo rows normalized
+    by an older normalize_roaming (region names were read as single countries).
+    """
+    result = await conn.execute(text(
+        "SELECT id, roaming, roaming_normalized FROM phone_plans_db WHERE roaming IS NOT NULL"
+    ))
+    updates = []
+    for row in result:
+        codes = normalize_roaming(row.roaming)
+        if row.roaming_normalized != codes:
+            updates.append({"id": row.id, "codes": codes})
+    if updates:
+        await conn.execute(text("UPDATE phone_plans_db SET roaming_normalized = :codes WHERE id = :id"), updates)
+        print(f"Normalized roaming for {len(updates)} existing plans")
+
+
+# Python data fixes run after SCHEMA_UPGRADES; each only touches rows that still need it
+DATA_UPGRADES = [backfill_roaming_normalized]
+
+
+async def upgrade_schema(conn: AsyncConnection):
+    for statement in SCHEMA_UPGRADES:
+        await conn.execute(text(statement))
+    for upgrade in DATA_UPGRADES:
+        await upgrade(conn)
+
+
+async def upgrade_database(engine: AsyncEngine, create_tables: bool = False):
+    """
+    Bring the database up to the models in one transaction. Runs at app startup in every
+    environment (unless DB_UPGRADE_ON_STARTUP=false), or on its own with
+    `python -m backend.db.migrations` before starting the app.
+    create_tables=True (dev) also creates the extension and any missing tables first.
+    """
+    async with engine.begin() as conn:
+        if create_tables:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
+    print("Database schema is up to date")
+
+
+if __name__ == "__main__":
+    import os
+    from backend.db.session import engine
+    asyncio.run(upgrade_database(engine, create_tables=os.getenv("ENV") == "dev"))
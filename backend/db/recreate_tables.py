@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from backend.db.session import AsyncSessionLocal
 from backend.models.sales_models import Base
 from backend.models.csv_row import CsvRow
+from backend.models.cache_models import LlmResponseCache
 from sqlalchemy import text
 
 async def recreate_tables():
@@ -12,6 +13,7 @@ async def recreate_tables():
         await session.execute(text("DROP TABLE IF EXISTS sales_search_messages CASCADE"))
         await session.execute(text("DROP TABLE IF EXISTS sales_users CASCADE"))
         await session.execute(text("DROP TABLE IF EXISTS phone_plans_db CASCADE"))
+        await session.execute(text("DROP TABLE IF EXISTS llm_response_cache CASCADE"))
         
         # Create all tables
         async with session.begin():
@@ -2,15 +2,8 @@ import asyncio
 from backend.db.session import AsyncSessionLocal
 from backend.models.csv_row import CsvRow
 from sqlalchemy import text
-from sentence_transformers import SentenceTransformer
-from dotenv import load_dotenv
 from backend.utils.text_formatter import row_to_text_dict
-import os
-load_dotenv()
-
-embedding_model = os.getenv("EMBEDDING_MODEL")
-
-model = SentenceTransformer(embedding_model)
+from backend.services.model_registry import get_model
 
 def row_to_text(row):
     return (
@@ -38,7 +31,7 @@ def row_to_text(row):
 async def test_query():
     async with AsyncSessionLocal() as db:
         query = "cheap unlimited data plan"
-        embedding = model.encode([query])[0].tolist()
+        embedding = get_model().encode([query])[0].tolist()
         vector_string = f"[{', '.join(str(x) for x in embedding)}]"
 
         sql = text("""
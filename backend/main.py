@@ -1,43 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.api import csv_routes, gpt_routes, wechat_routes, sales_routes, webhook_routes
-from backend.db.base import Base
+from backend.api import csv_routes, gpt_routes, wechat_routes, sales_routes, webhook_routes, admin_routes
 from backend.db.session import engine
+from backend.db.migrations import upgrade_database
+from backend.services import model_registry
+from backend.services.vector_search_service import refresh_vector_index
+from fastapi.concurrency import run_in_threadpool
 import os
-import asyncio
-from sqlalchemy.ext.asyncio import AsyncEngine
-from sqlalchemy.sql import text
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 
-# Async DB init for dev mode
-async def init_db(engine: AsyncEngine):
-    async with engine.begin() as conn:
-        #await conn.run_sync(Base.metadata.drop_all)   # DANGER
-        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-        await conn.run_sync(Base.metadata.create_all)
-
-def run_async_if_needed(coro):
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = None
-
-    if loop and loop.is_running():
-        # Already in an event loop (e.g., uvicorn with reload)
-        asyncio.create_task(coro)
-    else:
-        asyncio.run(coro)
-
-
-if os.getenv("ENV") == "dev":
-    #print("Dev mode: dropping and creating tables")
-    run_async_if_needed(init_db(engine))
-    print("Dev mode: skipping DB init")
-
-
 app = FastAPI()
 # Allow frontend (localhost:5173)
 origins = [
@@ -54,8 +28,35 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def upgrade_db_schema():
+    # Not only in dev: the models select columns that older databases only get from here.
+    # Registered first so the vector index check below sees the new columns. In dev this also
+    # creates the extension and missing tables, in the same transaction so nothing races it.
+    if os.getenv("DB_UPGRADE_ON_STARTUP", "true").lower() == "true":
+        await upgrade_database(engine, create_tables=os.getenv("ENV") == "dev")
+
+
+@app.on_event("startup")
+async def warm_up_embedding_model():
+    # Pay the model load before the first request instead of on it.
+    # With a shared embedding server the model only loads here if the server is unreachable.
+    if os.getenv("EMBEDDING_WARMUP", "true").lower() == "true" and not os.getenv("EMBEDDING_SERVER_SOCKET"):
+        await run_in_threadpool(model_registry.warm_up)
+
+
+@app.on_event("startup")
+async def create_vector_index():
+    # CREATE INDEX IF NOT EXISTS, so this is a no-op once the index is built
+    try:
+        await refresh_vector_index(after_reload=False)
+    except Exception as e:
+        print(f"Vector index check failed: {e}")
+
+
 app.include_router(csv_routes.router, prefix="/api/csv")
 app.include_router(gpt_routes.router, prefix="/api/query")
 app.include_router(wechat_routes.router, prefix="/api/wechat")
 app.include_router(sales_routes.router, prefix="/api/sales")
 app.include_router(webhook_routes.router, prefix="/webhook")
+app.include_router(admin_routes.router, prefix="/api/admin")
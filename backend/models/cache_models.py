@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Index
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import JSONB
+from backend.db.base import Base
+
+class LlmResponseCache(Base):
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of prompt name/version, normalized input, providers
+    prompt_name = Column(String, nullable=False)
+    response = Column(JSONB, nullable=False)  # parsed JSON returned by the model
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("idx_llm_response_cache_expires_at", "expires_at"),
+        Index("idx_llm_response_cache_created_at", "created_at"),
+    )
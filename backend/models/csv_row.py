@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, Date, Boolean
+from sqlalchemy import Column, Integer, Float, String, DateTime, Date, Boolean, Computed, Index, func
 from sqlalchemy.dialects.postgresql import ARRAY
 from backend.db.base import Base
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import Vector, HALFVEC, BIT
 
 class CsvRow(Base):
     __tablename__ = "phone_plans_db"
+    __table_args__ = (
+        Index("ix_phone_plans_db_roaming_normalized", "roaming_normalized", postgresql_using="gin"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(String)
     item_name = Column(String)
@@ -20,12 +23,17 @@ class CsvRow(Base):
     original_price = Column(Float)
     overage_rate = Column(Float)
     roaming = Column(ARRAY(String))
+    roaming_normalized = Column(ARRAY(String))  # ISO alpha-2 codes from roaming, what filters match against
     byod_or_term = Column(Boolean)
     free_ld = Column(String)
     activation_fee = Column(Float)
     code = Column(String)
     tier = Column(String)
     embedding = Column(Vector(384))
+    # Compact copies of embedding kept by Postgres, used for candidate search before exact re-ranking
+    embedding_half = Column(HALFVEC(384), Computed("embedding::halfvec(384)", persisted=True))
+    embedding_bit = Column(BIT(384), Computed("binary_quantize(embedding)::bit(384)", persisted=True))
+    text_hash = Column(String(64), index=True)  # hash of the embedded text, to reuse vectors across uploads
 
     def to_dict(self, include_embedding: bool = False) -> dict:
         d = {
@@ -44,6 +52,7 @@ class CsvRow(Base):
             "original_price": self.original_price,
             "overage_rate": self.overage_rate,
             "roaming": self.roaming,
+            "roaming_normalized": self.roaming_normalized,
             "byod_or_term": self.byod_or_term,
             "free_ld": self.free_ld,
             "activation_fee": self.activation_fee,
@@ -53,3 +62,10 @@ class CsvRow(Base):
         if include_embedding:
             d["embedding"] = list(self.embedding) if self.embedding is not None else None
         return d
+
+
+# Structured filter indexes; SCHEMA_UPGRADES adds the same ones to existing databases
+Index("ix_phone_plans_db_price_data", CsvRow.promotion_price, CsvRow.data)
+Index("ix_phone_plans_db_provider_lower", func.lower(CsvRow.provider))
+Index("ix_phone_plans_db_byod_price_data", CsvRow.promotion_price, CsvRow.data,
+      postgresql_where=CsvRow.byod_or_term == True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Boolean, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.db.base import Base
@@ -49,6 +49,8 @@ class SearchResults(Base):
 
 class SalesUserRequirements(Base):
     __tablename__ = "sales_user_requirements"
+    # One requirements row per search; autosaves upsert on it
+    __table_args__ = (UniqueConstraint("user_id", "search_id", name="uq_sales_user_requirements_user_search"),)
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -1,4 +1,5 @@
 # backend/prompts/prompt_registry.py
+import hashlib
 
 PROMPTS = {
     "extract_user_requirements": """
@@ -113,20 +114,14 @@ User: {user_input}
 """,
     "recommend_plans_response": """
 Use the following data to answer the user's question.
-You must return **exactly {k} plans** from the list below. Use this strict logic:
+The phone plans below have already been filtered and ranked for this customer, best first. Your job is only to present and explain them:
 
-If the user says that they are currently using a provider, exclude all plans from that provider before any filtering is done.
-
-Then apply the following ranking logic:
-1. If fewer than 3 valid plans are found, list all and state clearly: "Only X plans met the criteria."
-2. If more than 3 valid plans are found, choose the 3 with:
-    - Lowest promotion price first
-    - Then highest data
-    - Then most countries in the roaming list
+1. Present every plan below, in the order given. Do NOT reorder, drop, add or combine plans.
+2. If fewer than {k} plans are listed, state clearly: "Only X plans met the criteria."
 3. Each plan must be **clearly listed**, and followed by 2-3 point-form reasons the user would like it.
-4. Do NOT skip any matching plans. Do NOT combine similar plans. Do NOT hallucinate.
+4. Only use facts from the plan data. Do NOT hallucinate.
 
-- If the user says that they are currently using a provider, ignore and do not let it influence your answer besides filtering the plans out.
+- If the user says that they are currently using a provider, do not let it influence your answer; those plans are already excluded.
 
 ---
 Phone Plans:
@@ -148,3 +143,13 @@ def get_prompt(name: str, **kwargs) -> str:
         raise ValueError(f"Prompt '{name}' not found.")
     except KeyError as e:
         raise ValueError(f"Missing placeholder {str(e)} in prompt '{name}'.")
+
+
+def get_prompt_version(name: str) -> str:
+    """
+    Short hash of the prompt template, so anything cached from an older wording is not reused.
+    """
+    try:
+        return hashlib.sha256(PROMPTS[name].encode("utf-8")).hexdigest()[:12]
+    except KeyError:
+        raise ValueError(f"Prompt '{name}' not found.")
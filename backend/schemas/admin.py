@@ -0,0 +1,10 @@
+from typing import List
+from pydantic import BaseModel
+
+class VectorReportRequest(BaseModel):
+    queries: List[str] = [
+        "cheap unlimited data plan",
+        "provider: rogers, bell roaming: china",
+        "byod: true target_price: 40",
+    ]
+    k: int = 10
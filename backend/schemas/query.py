@@ -1,4 +1,19 @@
-from pydantic import BaseModel
+from typing import Dict, Optional
+from pydantic import BaseModel, field_validator
+from backend.utils.plan_ranking import RANKING_FEATURES
+
 class QueryRequest(BaseModel):
     question: str = "I use rogers and am going on vacation to china"
-    k: int = 3
\ No newline at end of file
+    k: int = 3
+    ef_search: Optional[int] = None  # HNSW candidate list size for this query
+    probes: Optional[int] = None  # IVFFlat lists scanned for this query
+    weights: Optional[Dict[str, float]] = None  # overrides RANKING_WEIGHTS, e.g. {"price": 1, "distance": 0.5}
+
+    @field_validator('weights')
+    @classmethod
+    def check_weight_features(cls, v: Optional[Dict[str, float]]) -> Optional[Dict[str, float]]:
+        # Rejected here so the caller gets a 422 rather than a ValueError from rank_plans
+        unknown = set(v or {}) - set(RANKING_FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown ranking feature(s) {', '.join(sorted(unknown))}. Use {', '.join(RANKING_FEATURES)}.")
+        return v
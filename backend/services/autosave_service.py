@@ -2,46 +2,34 @@ from backend.models.sales_models import SalesUserRequirements, SalesUserSearch
 from backend.schemas.user_requirements import UserRequirements
 from backend.schemas.message import UserSearchCreate
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 from fastapi import HTTPException
 
+
+def requirements_upsert_stmt(user_id: str, search_id: str, req: UserRequirements):
+    """
+    INSERT ... ON CONFLICT (user_id, search_id) DO UPDATE for a requirements row, returning it.
+    Only fields set on req are written, so partial saves keep earlier values.
+    """
+    values = {field: value for field, value in req.model_dump().items() if value is not None}
+    stmt = insert(SalesUserRequirements).values(user_id=user_id, search_id=search_id, **values)
+    # Nothing to change still needs a SET for RETURNING to give back the existing row
+    updates = {field: stmt.excluded[field] for field in values} or {"user_id": stmt.excluded.user_id}
+    return (
+        stmt.on_conflict_do_update(index_elements=["user_id", "search_id"], set_=updates)
+        .returning(SalesUserRequirements)
+        .execution_options(populate_existing=True)
+    )
+
+
 async def autosave_user_requirements(user_id: str, search_id: str, req: UserRequirements, db: AsyncSession):
     """
     Upsert (autosave) the user requirements for a given user ID and search ID, allowing partial data.
     """
     try:
-        result = await db.execute(
-            select(SalesUserRequirements)
-            .where(
-                and_(
-                    SalesUserRequirements.user_id == user_id,
-                    SalesUserRequirements.search_id == search_id
-                )
-            )
-        )
-        requirements_row = result.scalar_one_or_none()
-        if requirements_row is None:
-            # Insert new requirements row
-            requirements_row = SalesUserRequirements(
-                user_id=user_id,
-                search_id=search_id,
-                current_provider=req.current_provider,
-                target_price=req.target_price,
-                target_data=req.target_data,
-                min_data_gb=req.min_data_gb,
-                byod=req.byod,
-                roaming=req.roaming
-            )
-            db.add(requirements_row)
-        else:
-            # Update existing row with any new values
-            for field in req.__class__.model_fields:
-                value = getattr(req, field, None)
-                if value is not None:
-                    setattr(requirements_row, field, value)
-        await db.flush()
+        await db.execute(requirements_upsert_stmt(user_id, search_id, req))
         await db.commit()
-        await db.refresh(requirements_row)
         return {"status": "success", "search_id": search_id}
     except Exception as e:
         await db.rollback()
@@ -52,31 +40,20 @@ async def autosave_user_search(user_id: str, search_id: str, search: UserSearchC
     Upsert (autosave) the user search for a given user ID and search ID, allowing partial data (e.g., customer_name).
     """
     try:
-        result = await db.execute(
-            select(SalesUserSearch)
-            .where(
-                and_(
-                    SalesUserSearch.user_id == user_id,
-                    SalesUserSearch.id == search_id
-                )
-            )
-        )
-        search_row = result.scalar_one_or_none()
-        if search_row is None:
-            # Insert new search row
-            search_row = SalesUserSearch(
-                id=search_id,
-                user_id=user_id,
-                customer_name=search.customer_name
-            )
-            db.add(search_row)
-        else:
-            # Update existing row with any new values
-            if search.customer_name is not None:
-                search_row.customer_name = search.customer_name
-        await db.flush()
+        stmt = insert(SalesUserSearch).values(id=search_id, user_id=user_id, customer_name=search.customer_name)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SalesUserSearch.id],
+            set_={
+                "customer_name": func.coalesce(stmt.excluded.customer_name, SalesUserSearch.customer_name),
+                "updated_at": func.now(),
+            },
+            # A search id belongs to one user; another user's autosave must not take it over
+            where=SalesUserSearch.user_id == stmt.excluded.user_id,
+        ).returning(SalesUserSearch.id)
+        result = await db.execute(stmt)
+        if result.scalar_one_or_none() is None:
+            raise ValueError(f"Search {search_id} belongs to another user")
         await db.commit()
-        await db.refresh(search_row)
         return {"status": "success", "search_id": search_id}
     except Exception as e:
         await db.rollback()
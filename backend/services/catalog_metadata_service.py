@@ -0,0 +1,50 @@
+import asyncio
+import os
+import time
+from sqlalchemy import func
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models.csv_row import CsvRow
+
+# The catalog only changes on upload. The uploading worker invalidates right away;
+# other workers pick the change up within the TTL.
+cache_ttl_seconds = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+
+_cache = {"metadata": None, "loaded_at": 0.0}
+_lock = None
+
+
+async def _load(db: AsyncSession) -> dict:
+    providers = await db.execute(select(func.lower(CsvRow.provider)).distinct())
+    regions = await db.execute(select(CsvRow.region).distinct())
+    roaming = await db.execute(select(func.unnest(CsvRow.roaming_normalized)).distinct())
+    # Sorted so prompts and cache keys built from these lists are stable
+    return {
+        "providers": sorted(p for p in providers.scalars().all() if p),
+        "regions": sorted(r for r in regions.scalars().all() if r),
+        "roaming_countries": sorted(c for c in roaming.scalars().all() if c),
+    }
+
+
+def _is_fresh() -> bool:
+    return _cache["metadata"] is not None and time.monotonic() - _cache["loaded_at"] < cache_ttl_seconds
+
+
+async def get_catalog_metadata(db: AsyncSession) -> dict:
+    """
+    Distinct providers, regions and roaming countries in phone_plans_db, cached in-process.
+    """
+    global _lock
+    if _is_fresh():
+        return _cache["metadata"]
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        if not _is_fresh():
+            _cache["metadata"] = await _load(db)
+            _cache["loaded_at"] = time.monotonic()
+    return _cache["metadata"]
+
+
+def invalidate_catalog_metadata():
+    _cache["metadata"] = None
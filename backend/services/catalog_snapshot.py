@@ -0,0 +1,70 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class CatalogSnapshot(ABC):
+    """
+    Lifecycle shared by the in-process copies of phone_plans_db: a snapshot built from the
+    database, rebuilt after each catalog upload in this worker and at most ttl_seconds old in the
+    others. Subclasses implement build() and describe().
+    """
+
+    name = "catalog snapshot"
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self.snapshot = None
+        self.built_at = 0.0
+        self.build_seconds = None
+        self._build_lock = None
+
+    @abstractmethod
+    async def build(self, db: AsyncSession):
+        """
+        A new snapshot read from the database.
+        """
+
+    def describe(self, snapshot) -> dict:
+        return {}
+
+    def is_stale(self) -> bool:
+        return self.snapshot is None or time.monotonic() - self.built_at > self.ttl_seconds
+
+    def _lock(self) -> asyncio.Lock:
+        # Created on first use so it belongs to the running loop
+        if self._build_lock is None:
+            self._build_lock = asyncio.Lock()
+        return self._build_lock
+
+    async def rebuild(self, db: AsyncSession, only_if_stale: bool = False):
+        async with self._lock():
+            if only_if_stale and not self.is_stale():
+                return
+            start = time.perf_counter()
+            snapshot = await self.build(db)
+            # One object per build, so a search that took the old one keeps a consistent view
+            self.snapshot = snapshot
+            self.built_at = time.monotonic()
+            self.build_seconds = round(time.perf_counter() - start, 3)
+            details = ", ".join(f"{value} {key}" for key, value in self.describe(snapshot).items())
+            print(f"Built {self.name}: {details} in {self.build_seconds}s")
+
+    async def fresh(self, db: AsyncSession):
+        """
+        The current snapshot, rebuilt first if it's missing or older than ttl_seconds.
+        """
+        if self.is_stale():
+            await self.rebuild(db, only_if_stale=True)
+        return self.snapshot
+
+    def stats(self) -> dict:
+        built = self.snapshot is not None
+        return {
+            **(self.describe(self.snapshot) if built else {}),
+            "built": built,
+            "age_seconds": round(time.monotonic() - self.built_at, 1) if built else None,
+            "build_seconds": self.build_seconds,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -5,8 +5,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from backend.models.csv_row import CsvRow
 import re
-from backend.services.embedding_service import update_embeddings
-from sqlalchemy import text
+from backend.services.embedding_service import embedding_text_hash, load_embeddings_by_hash
+from backend.services.embedding_backfill import backfill_embeddings
+from backend.services.catalog_metadata_service import invalidate_catalog_metadata
+from backend.utils.text_formatter import row_to_text_orm_weighted
+from backend.utils.countries import normalize_roaming
+from sqlalchemy import text, select
+from collections import defaultdict
 
 # Header mapping from CSV → DB model
 COLUMN_MAP = {
@@ -84,7 +89,48 @@ def parse_byod_or_term(value):
             return False
     return None
 
-async def store_csv_to_db(file: UploadFile, db: AsyncSession) -> str:
+def clean_record(record: dict) -> dict:
+    record = clean_nulls(record)
+    record["promo_start_date"] = parse_date(record.get("promo_start_date") or "")
+    record["promo_end_date"] = parse_date(record.get("promo_end_date") or "")
+    record["promotion_price"] = clean_price(record.get("promotion_price"))
+    record["original_price"] = clean_price(record.get("original_price"))
+    record["activation_fee"] = clean_price(record.get("activation_fee"))
+    record["overage_rate"] = parse_overage_rate(record.get("overage_rate"))
+    record["data"] = parse_data(record.get("data"), record.get("gb", ""))
+    record["roaming"] = [country.lower().strip() for country in record.get("roaming", "").split(",")] if record.get("roaming") else None
+    record["roaming_normalized"] = normalize_roaming(record["roaming"])
+    record["byod_or_term"] = parse_byod_or_term(record.get("byod_or_term"))
+    # Stored as uploaded for display; filters compare lower(provider), which the functional index covers
+    record["provider"] = record["provider"].strip() if isinstance(record.get("provider"), str) else record.get("provider")
+    record.pop("gb", None)
+    return record
+
+def natural_key(plan) -> tuple:
+    """
+    Identifies the same plan across uploads: provider + item name + code + promo dates.
+    """
+    get = plan.get if isinstance(plan, dict) else lambda field: getattr(plan, field)
+    return (
+        (get("provider") or "").strip().lower(),
+        (get("item_name") or "").strip().lower(),
+        (get("code") or "").strip().lower(),
+        get("promo_start_date"),
+        get("promo_end_date"),
+    )
+
+def attach_embedding(row: CsvRow, existing_embeddings: dict) -> bool:
+    """
+    Set the row's text_hash and reuse a stored vector for the same text. Returns True if one was reused.
+    """
+    text_hash = embedding_text_hash(row_to_text_orm_weighted(row))
+    if text_hash == row.text_hash and row.embedding is not None:
+        return False
+    row.text_hash = text_hash
+    row.embedding = existing_embeddings.get(text_hash)
+    return row.embedding is not None
+
+async def store_csv_to_db(file: UploadFile, db: AsyncSession, mode: str = "replace") -> dict:
     try:
         contents = await file.read()
         df = pd.read_csv(io.StringIO(contents.decode()), keep_default_na=True, na_values=[""])
@@ -94,33 +140,80 @@ async def store_csv_to_db(file: UploadFile, db: AsyncSession) -> str:
 
     # Rename columns to match DB fields
     df.rename(columns=COLUMN_MAP, inplace=True)
-    records = df.to_dict(orient="records")
+    records = [clean_record(record) for record in df.to_dict(orient="records")]
 
     try:
-        
-        await db.execute(text("DELETE FROM phone_plans_db"))
-        saved = 0
-        for record in records:
-            record = clean_nulls(record)
-            record["promo_start_date"] = parse_date(record.get("promo_start_date") or "")
-            record["promo_end_date"] = parse_date(record.get("promo_end_date") or "")
-            record["promotion_price"] = clean_price(record.get("promotion_price"))
-            record["original_price"] = clean_price(record.get("original_price"))
-            record["activation_fee"] = clean_price(record.get("activation_fee"))
-            record["overage_rate"] = parse_overage_rate(record.get("overage_rate"))
-            record["data"] = parse_data(record.get("data"), record.get("gb", ""))
-            record["roaming"] = [country.lower().strip() for country in record.get("roaming", "").split(",")] if record.get("roaming") else None
-            record["byod_or_term"] = parse_byod_or_term(record.get("byod_or_term"))
-            record.pop("gb", None)
-            row = CsvRow(**record)
-            db.add(row)
-            saved += 1
+        # Vectors of the current catalog, so unchanged plans don't get re-encoded
+        existing_embeddings = await load_embeddings_by_hash(db)
+        if mode == "diff":
+            summary = await sync_records(records, existing_embeddings, db)
+        else:
+            summary = await replace_records(records, existing_embeddings, db)
 
-        await update_embeddings(db)
+        # Not committed per page: the upload stays one transaction
+        summary["encoded"] = (await backfill_embeddings(db, commit=False))["rows"]
 
         await db.commit()
-        return saved
+        invalidate_catalog_metadata()
+        return summary
 
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"CSV upload failed. Rolled back. Reason: {e}")
+
+async def replace_records(records: list, existing_embeddings: dict, db: AsyncSession) -> dict:
+    """
+    Delete the whole catalog and insert every record.
+    """
+    await db.execute(text("DELETE FROM phone_plans_db"))
+    reused = 0
+    for record in records:
+        row = CsvRow(**record)
+        reused += attach_embedding(row, existing_embeddings)
+        db.add(row)
+    return {"rows": len(records), "reused": reused}
+
+async def sync_records(records: list, existing_embeddings: dict, db: AsyncSession) -> dict:
+    """
+    Apply the upload as a diff against the current catalog, matching plans on natural_key.
+    Changed plans are updated in place (keeping their id), new ones inserted and missing ones deleted.
+    """
+    result = await db.execute(select(CsvRow))
+    current = defaultdict(list)
+    for row in result.scalars().all():
+        current[natural_key(row)].append(row)
+
+    inserted = updated = unchanged = reused = 0
+    for record in records:
+        matches = current.get(natural_key(record))
+        if not matches:
+            row = CsvRow(**record)
+            reused += attach_embedding(row, existing_embeddings)
+            db.add(row)
+            inserted += 1
+            continue
+
+        row = matches.pop(0)
+        changed = [field for field, value in record.items() if getattr(row, field) != value]
+        if not changed:
+            unchanged += 1
+            continue
+        for field in changed:
+            setattr(row, field, record[field])
+        reused += attach_embedding(row, existing_embeddings)
+        updated += 1
+
+    deleted = 0
+    for rows in current.values():
+        for row in rows:
+            await db.delete(row)
+            deleted += 1
+
+    return {
+        "rows": len(records),
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": unchanged,
+        "deleted": deleted,
+        "reused": reused,
+    }
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models.csv_row import CsvRow
+from backend.utils.text_formatter import row_to_text_orm_weighted
+from backend.services.embedding_service import encode_texts, embedding_text_hash
+
+# Everything row_to_text_orm_weighted reads, without pulling the stored vectors back
+TEXT_COLUMNS = [
+    CsvRow.id, CsvRow.item_name, CsvRow.provider, CsvRow.region, CsvRow.condition, CsvRow.channel,
+    CsvRow.line_type, CsvRow.promotion_price, CsvRow.original_price, CsvRow.overage_rate, CsvRow.data,
+    CsvRow.roaming, CsvRow.byod_or_term, CsvRow.free_ld, CsvRow.activation_fee,
+    CsvRow.promo_start_date, CsvRow.promo_end_date, CsvRow.code, CsvRow.tier,
+]
+
+
+async def backfill_embeddings(db: AsyncSession, batch_size: int = 500, commit: bool = True, after_id: int = 0) -> dict:
+    """
+    Embed every row with a NULL embedding, paging by id.
+
+    Fetching, encoding and writing run as separate stages connected by small queues, so the next
+    page is read and the previous one written while the current one is being encoded. With
+    commit=True each written page is committed, and a rerun after a crash only sees rows that
+    are still NULL, so it picks up where the last run stopped.
+    """
+    db_lock = asyncio.Lock()  # one session can't run statements concurrently
+    fetched = asyncio.Queue(maxsize=2)
+    encoded = asyncio.Queue(maxsize=2)
+    stats = {"rows": 0, "batches": 0, "last_id": after_id}
+    start = time.perf_counter()
+
+    async def fetch_stage():
+        cursor = after_id
+        while True:
+            async with db_lock:
+                result = await db.execute(
+                    select(*TEXT_COLUMNS)
+                    .where(CsvRow.embedding == None, CsvRow.id > cursor)
+                    .order_by(CsvRow.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+            if not rows:
+                break
+            cursor = rows[-1].id
+            await fetched.put(rows)
+        await fetched.put(None)
+
+    async def encode_stage():
+        while (rows := await fetched.get()) is not None:
+            texts = [row_to_text_orm_weighted(r) for r in rows]
+            vectors = await encode_texts(texts)
+            await encoded.put([
+                {"id": r.id, "embedding": vector, "text_hash": embedding_text_hash(text)}
+                for r, text, vector in zip(rows, texts, vectors)
+            ])
+        await encoded.put(None)
+
+    async def write_stage():
+        while (updates := await encoded.get()) is not None:
+            async with db_lock:
+                await db.execute(update(CsvRow), updates)
+                if commit:
+                    await db.commit()
+            stats["rows"] += len(updates)
+            stats["batches"] += 1
+            stats["last_id"] = updates[-1]["id"]
+
+    tasks = [asyncio.create_task(stage()) for stage in (fetch_stage, encode_stage, write_stage)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    stats["rows_per_second"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else None
+    print(f"Embedding backfill: {stats}")
+    return stats
@@ -0,0 +1,104 @@
+import asyncio
+import os
+from fastapi.concurrency import run_in_threadpool
+from backend.services.model_registry import get_model
+
+max_batch_size = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+max_wait_ms = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+
+def encode_in_process(texts: list) -> list:
+    return get_model().encode(texts).tolist()
+
+
+class EmbeddingBatcher:
+    """
+    Collects encode requests from concurrent callers and runs them through the model as one batch.
+
+    A batch is flushed once it holds max_batch_size texts or max_wait_ms after its first request,
+    whichever comes first. Encoding runs in the threadpool so the event loop stays free.
+    """
+
+    def __init__(self, encode_fn=encode_in_process, max_batch_size: int = 64, max_wait_ms: float = 5):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batches = 0
+        self.texts = 0
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def encode(self, texts: list) -> list:
+        """
+        Encode texts and return one vector (list of floats) per text, in order.
+        """
+        if not texts:
+            return []
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((list(texts), future))
+        return await future
+
+    async def _run(self):
+        pending = None
+        while True:
+            first = pending or await self._queue.get()
+            pending = None
+            batch = [first]
+            size = len(first[0])
+            deadline = self._loop.time() + self.max_wait_ms / 1000
+
+            while size < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if size + len(item[0]) > self.max_batch_size:
+                    # Doesn't fit; it starts the next batch
+                    pending = item
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        texts = [text for item_texts, _ in batch for text in item_texts]
+        try:
+            vectors = await run_in_threadpool(self.encode_fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.texts += len(texts)
+        offset = 0
+        for item_texts, future in batch:
+            if not future.done():
+                future.set_result(vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else None,
+        }
+
+
+embedding_batcher = EmbeddingBatcher(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import time
+from backend.utils.embedding_protocol import encode_request, read_response
+
+socket_path = os.getenv("EMBEDDING_SERVER_SOCKET")
+timeout_seconds = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "10"))
+retry_after_seconds = float(os.getenv("EMBEDDING_SERVER_RETRY_SECONDS", "30"))
+
+
+class EmbeddingClient:
+    """
+    Client for backend.services.embedding_server. Keeps idle connections around for reuse.
+    """
+
+    def __init__(self, path: str, timeout: float = 10, retry_after: float = 30):
+        self.path = path
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._idle = []
+        self._down_until = 0.0
+
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def mark_down(self):
+        self._down_until = time.monotonic() + self.retry_after
+
+    async def _connection(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing():
+                return reader, writer
+        return await asyncio.open_unix_connection(self.path)
+
+    async def encode(self, texts: list) -> list:
+        reader, writer = await asyncio.wait_for(self._connection(), self.timeout)
+        try:
+            writer.write(encode_request(texts))
+            await writer.drain()
+            vectors = await asyncio.wait_for(read_response(reader), self.timeout)
+        except BaseException:
+            writer.close()
+            raise
+        self._idle.append((reader, writer))
+        return vectors.tolist()
+
+
+embedding_client = EmbeddingClient(socket_path, timeout_seconds, retry_after_seconds) if socket_path else None
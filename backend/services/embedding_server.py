@@ -0,0 +1,49 @@
+"""
+Standalone embedding process shared by all API workers on a host.
+
+    python -m backend.services.embedding_server
+
+Owns the only copy of the model and answers encode requests on the Unix socket at
+EMBEDDING_SERVER_SOCKET. Requests from all connected workers go through one micro-batcher.
+"""
+import asyncio
+import os
+from dotenv import load_dotenv
+from backend.services import model_registry
+from backend.services.embedding_batcher import embedding_batcher
+from backend.utils.embedding_protocol import read_request, encode_response, encode_error
+
+load_dotenv()
+
+socket_path = os.getenv("EMBEDDING_SERVER_SOCKET", "/tmp/embedding.sock")
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            try:
+                texts = await read_request(reader)
+            except asyncio.IncompleteReadError:
+                break
+            try:
+                vectors = await embedding_batcher.encode(texts)
+                writer.write(encode_response(vectors))
+            except Exception as e:
+                writer.write(encode_error(str(e)))
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve():
+    model_registry.warm_up()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(handle_client, path=socket_path)
+    print(f"Embedding server listening on {socket_path}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
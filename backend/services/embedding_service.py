@@ -1,61 +1,59 @@
-import faiss
-import numpy as np
-import json
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-import os
-from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
-from backend.db.session import AsyncSessionLocal
 from backend.models.csv_row import CsvRow
-from fastapi.concurrency import run_in_threadpool
-from backend.utils.text_formatter import row_to_text_orm_weighted
-
-load_dotenv()
+from backend.services.embedding_batcher import embedding_batcher
+from backend.services.embedding_client import embedding_client
+from backend.utils.embedding_cache import EmbeddingCache
+import os
+import asyncio
+import hashlib
+
+# Set EMBEDDING_CACHE_CASEFOLD=true only when EMBEDDING_MODEL is uncased (e.g. all-MiniLM-L6-v2)
+query_embedding_cache = EmbeddingCache(
+    int(os.getenv("EMBEDDING_CACHE_SIZE", "1024")),
+    casefold=os.getenv("EMBEDDING_CACHE_CASEFOLD", "false").lower() == "true",
+)
 embedding_model = os.getenv("EMBEDDING_MODEL")
 
-model = SentenceTransformer(embedding_model)
-
-async def update_embeddings(db: AsyncSession, batch_size=500):
-    offset = 0
-    total_updated = 0
-
-    while True:
-        result = await db.execute(
-            select(CsvRow)
-            .where(CsvRow.embedding == None)
-            .offset(offset)
-            .limit(batch_size)
-        )
-        rows = result.scalars().all()
-
-        if not rows:
-            break
-
-        weighted_texts = [row_to_text_orm_weighted(r) for r in rows]
-
-        # Run in threadpool to avoid blocking event loop
-        embeddings = await run_in_threadpool(model.encode, weighted_texts)
-
-        for row, emb in zip(rows, embeddings):
-            row.embedding = emb.tolist()
-
-        await db.commit()
-        total_updated += len(rows)
-        offset += batch_size
-
-    return total_updated
-
-
-#NOT USED YET
-def search(query, top_k=5):
-    index = faiss.read_index("faiss_store/phone_index.faiss")
-    with open("faiss_store/id_map.json", "r", encoding="utf-8") as f:
-        id_map = json.load(f)
-        id_map = {int(k): v for k, v in id_map.items()}
 
-    query_vec = model.encode([query], convert_to_numpy=True)
-    D, I = index.search(query_vec, top_k)
+def embedding_text_hash(text: str) -> str:
+    """
+    Hash of the text a row is embedded from. The model name is included so switching models invalidates it.
+    """
+    return hashlib.sha256(f"{embedding_model}\n{text}".encode("utf-8")).hexdigest()
+
+
+async def load_embeddings_by_hash(db: AsyncSession) -> dict:
+    """
+    Map text_hash -> stored embedding for every row that has both.
+    """
+    result = await db.execute(
+        select(CsvRow.text_hash, CsvRow.embedding)
+        .where(CsvRow.text_hash != None, CsvRow.embedding != None)
+    )
+    return {text_hash: embedding for text_hash, embedding in result.all()}
+
+
+async def encode_texts(texts: list) -> list:
+    """
+    Encode texts on the shared embedding server when one is configured, otherwise in this process.
+    """
+    if embedding_client is not None and embedding_client.available():
+        try:
+            return await embedding_client.encode(texts)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RuntimeError) as e:
+            print(f"Embedding server unavailable, encoding in-process: {e}")
+            embedding_client.mark_down()
+    return await embedding_batcher.encode(texts)
+
+
+async def encode_query(prompt: str) -> list:
+    """
+    Encode a single search prompt, reusing the cached vector when the same prompt was seen before.
+    """
+    vector = query_embedding_cache.get(prompt)
+    if vector is None:
+        vector = (await encode_texts([prompt]))[0]
+        query_embedding_cache.put(prompt, vector)
+    return vector
 
-    db = AsyncSessionLocal()
-    return [db.query(CsvRow).get(id_map[i]) for i in I[0]]
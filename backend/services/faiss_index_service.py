@@ -0,0 +1,90 @@
+import os
+import faiss
+import numpy as np
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
+from backend.models.csv_row import CsvRow
+from backend.services.catalog_snapshot import CatalogSnapshot
+
+index_ttl_seconds = float(os.getenv("FAISS_INDEX_TTL_SECONDS", "300"))
+
+
+class FaissPlanIndex(CatalogSnapshot):
+    """
+    In-memory exact L2 index over phone_plans_db.embedding, keyed by plan id.
+
+    Keeps the plan rows next to the index, so a filtered search is answered without going to the
+    database. The snapshot is (index, plans by id).
+    """
+
+    name = "FAISS plan index"
+
+    def __init__(self, dim: int = 384, ttl_seconds: float = 300):
+        super().__init__(ttl_seconds)
+        self.dim = dim
+
+    async def build(self, db: AsyncSession):
+        result = await db.execute(select(CsvRow).where(CsvRow.embedding != None))
+        rows = result.scalars().all()
+        plans = {row.id: row.to_dict() for row in rows}
+        ids = np.array([row.id for row in rows], dtype="int64")
+        vectors = np.array([row.embedding for row in rows], dtype="float32").reshape(len(rows), self.dim)
+
+        def build():
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dim))
+            if len(ids):
+                index.add_with_ids(vectors, ids)
+            return index
+
+        return await run_in_threadpool(build), plans
+
+    def describe(self, snapshot) -> dict:
+        return {"plans": len(snapshot[1])}
+
+    @staticmethod
+    def matching_ids(plan_filters: dict, plans: dict):
+        """
+        Ids of plans passing plan_filters, the conditions filters_to_search_prompt puts in SQL.
+        None means no filtering.
+        """
+        max_price = plan_filters.get("max_price")
+        min_data = plan_filters.get("min_data")
+        excluded = set(plan_filters.get("exclude_providers") or [])
+        roaming = set(plan_filters.get("roaming") or [])
+        if max_price is None and min_data is None and not excluded and not roaming:
+            return None
+
+        ids = []
+        for plan_id, plan in plans.items():
+            if max_price is not None and (plan["promotion_price"] is None or plan["promotion_price"] > max_price):
+                continue
+            if min_data is not None and (plan["data"] is None or plan["data"] < min_data):
+                continue
+            if excluded and (plan["provider"] is None or plan["provider"].lower() in excluded):
+                continue
+            if roaming and not roaming.issubset(plan["roaming_normalized"] or []):
+                continue
+            ids.append(plan_id)
+        return ids
+
+    async def search(self, db: AsyncSession, plan_filters: dict, query_embedding: list, k: int) -> list:
+        index, plans = await self.fresh(db)
+        allowed = self.matching_ids(plan_filters, plans)
+        if allowed is not None and not allowed:
+            return []
+
+        query = np.array([query_embedding], dtype="float32")
+        params = None
+        if allowed is not None:
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.array(allowed, dtype="int64")))
+        distances, ids = await run_in_threadpool(index.search, query, k, params=params)
+        return [
+            # IndexFlatL2 reports squared distances; <-> in pgvector is the plain L2 distance
+            {**plans[int(plan_id)], "distance": float(np.sqrt(distance))}
+            for plan_id, distance in zip(ids[0], distances[0])
+            if plan_id != -1
+        ]
+
+
+plan_index = FaissPlanIndex(ttl_seconds=index_ttl_seconds)
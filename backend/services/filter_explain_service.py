@@ -0,0 +1,77 @@
+import json
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.schemas.user_requirements import UserRequirements
+from backend.utils.query_filter import filters_to_search_prompt
+from backend.services.search_query_service import matching_plans_stmt
+
+
+def _filter_shape(filters: dict):
+    _, stmt, params, _ = filters_to_search_prompt(filters, [])
+    return stmt, params
+
+
+# The structured filters queries actually send, built by the same code with sample values
+FILTER_SHAPES = {
+    "price": lambda: _filter_shape({"target_price": 40}),
+    "price_data": lambda: _filter_shape({"target_price": 40, "target_data": 20}),
+    "exclude_provider": lambda: _filter_shape({"exclude_providers": ["rogers"]}),
+    "roaming": lambda: _filter_shape({"roaming": ["china"]}),
+    "price_data_provider_roaming": lambda: _filter_shape(
+        {"target_price": 40, "target_data": 20, "exclude_providers": ["rogers"], "roaming": ["china"]}
+    ),
+    "sales_byod_price": lambda: matching_plans_stmt(UserRequirements(target_price=40, byod=True)),
+    "sales_all": lambda: matching_plans_stmt(UserRequirements(
+        target_price=40, target_data=20, current_provider="rogers", roaming=["china"], byod=True
+    )),
+}
+
+
+async def _explain(db: AsyncSession, stmt, params: dict, options: str) -> dict:
+    # Compiled by the session's own dialect so binds carry their casts ($1::FLOAT); the generic
+    # dialect leaves them untyped and Postgres can't resolve expressions like $1 + CASE ... END
+    compiled = stmt.params(params).compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+    conn = await db.connection()
+    result = await conn.exec_driver_sql(
+        f"EXPLAIN ({options}) {compiled}", tuple(compiled.params[name] for name in compiled.positiontup)
+    )
+    plan = result.scalar()
+    # asyncpg hands json back as text
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
+
+def _plan_summary(node: dict, nodes: list, indexes: list):
+    nodes.append(node["Node Type"])
+    if node.get("Index Name"):
+        indexes.append(node["Index Name"])
+    for child in node.get("Plans", []):
+        _plan_summary(child, nodes, indexes)
+
+
+async def explain_filter_shapes(db: AsyncSession, analyze: bool = False) -> dict:
+    """
+    EXPLAIN every FILTER_SHAPES query and report the plan nodes, the indexes used and the cost.
+    analyze=True runs the queries for actual timings. A shape that fails reports its error
+    instead of failing the whole report.
+    """
+    report = {}
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    for name, build in FILTER_SHAPES.items():
+        stmt, params = build()
+        try:
+            # Savepoint per shape so one failure doesn't abort the transaction for the rest
+            async with db.begin_nested():
+                plan = await _explain(db, stmt, params, options)
+        except DBAPIError as e:
+            report[name] = {"error": str(e.orig or e)}
+            continue
+        nodes, indexes = [], []
+        _plan_summary(plan["Plan"], nodes, indexes)
+        report[name] = {
+            "nodes": nodes,
+            "indexes": indexes,
+            "total_cost": plan["Plan"]["Total Cost"],
+            "execution_ms": plan.get("Execution Time"),
+            "plan": plan["Plan"],
+        }
+    return report
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from backend.db.session import AsyncSessionLocal
+from backend.models.cache_models import LlmResponseCache
+from backend.prompts.prompt_registry import get_prompt_version
+
+cache_enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+cache_ttl_seconds = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def normalize_input(user_input: str) -> str:
+    return re.sub(r"\s+", " ", user_input or "").strip().lower()
+
+
+def cache_key(prompt_name: str, user_input: str, providers: list = None) -> str:
+    """
+    Key on what decides the model's answer: the prompt template, the user's words and the provider list.
+    """
+    parts = [
+        prompt_name,
+        get_prompt_version(prompt_name),
+        normalize_input(user_input),
+        ",".join(sorted(p.lower() for p in providers or [])),
+    ]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+async def get_cached(key: str):
+    """
+    Cached parsed response for key, or None. Uses its own session so callers don't share theirs.
+    """
+    if not cache_enabled:
+        return None
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(LlmResponseCache.response)
+                .where(LlmResponseCache.key == key, LlmResponseCache.expires_at > datetime.now(timezone.utc))
+            )
+            response = result.scalar_one_or_none()
+    except Exception as e:
+        # The cache is an optimization; never fail the request because of it
+        print(f"LLM cache read failed: {e}")
+        _stats["errors"] += 1
+        return None
+    _stats["hits" if response is not None else "misses"] += 1
+    return response
+
+
+async def set_cached(key: str, prompt_name: str, response):
+    if not cache_enabled:
+        return
+    now = datetime.now(timezone.utc)
+    stmt = insert(LlmResponseCache).values(
+        key=key,
+        prompt_name=prompt_name,
+        response=response,
+        created_at=now,
+        expires_at=now + timedelta(seconds=cache_ttl_seconds),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LlmResponseCache.key],
+        set_={"response": stmt.excluded.response, "created_at": stmt.excluded.created_at, "expires_at": stmt.excluded.expires_at},
+    )
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            # Drop expired entries, then the oldest ones beyond the size limit
+            await db.execute(delete(LlmResponseCache).where(LlmResponseCache.expires_at <= now))
+            overflow = (
+                select(LlmResponseCache.key)
+                .order_by(LlmResponseCache.created_at.desc())
+                .offset(cache_max_entries)
+            )
+            await db.execute(delete(LlmResponseCache).where(LlmResponseCache.key.in_(overflow)))
+            await db.commit()
+    except Exception as e:
+        print(f"LLM cache write failed: {e}")
+        _stats["errors"] += 1
+
+
+def cache_stats() -> dict:
+    total = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / total, 3) if total else None,
+        "enabled": cache_enabled,
+        "ttl_seconds": cache_ttl_seconds,
+        "max_entries": cache_max_entries,
+    }
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+load_dotenv()
+
+gpt_model = os.getenv("GPT_MODEL")
+llm_timeout_seconds = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+llm_max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# openai: the real API; local: LocalLLMTransport, answers in-process without network
+llm_transport = os.getenv("LLM_TRANSPORT", "openai")
+
+_client = None
+_semaphore = None
+_stats = {"calls": 0, "errors": 0, "in_flight": 0, "total_seconds": 0.0}
+
+
+class LocalLLMTransport(httpx.AsyncBaseTransport):
+    """
+    Stand-in for the OpenAI HTTP API. Replies to chat completions with whatever responder returns
+    for the request's messages, so services run unchanged in tests and offline development.
+    """
+
+    def __init__(self, responder=None):
+        self.responder = responder or (lambda messages: "{}")
+        self.requests = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content or b"{}")
+        self.requests.append(body)
+        content = self.responder(body.get("messages", []))
+        if body.get("stream"):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=self._stream_body(body, content))
+        return httpx.Response(200, json={
+            "id": f"chatcmpl-local-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or "local",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    @staticmethod
+    def _stream_body(body: dict, content: str) -> bytes:
+        chunk_id = f"chatcmpl-local-{uuid.uuid4().hex}"
+        events = []
+        for i, token in enumerate(content.split(" ")):
+            delta = {"content": token if i == 0 else " " + token}
+            events.append({
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model") or "local",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+            })
+        lines = [f"data: {json.dumps(event)}\n\n" for event in events]
+        lines.append("data: [DONE]\n\n")
+        return "".join(lines).encode("utf-8")
+
+
+local_transport = LocalLLMTransport()
+
+
+def get_client() -> AsyncOpenAI:
+    """
+    Process-wide async OpenAI client on one pooled HTTP connection pool.
+    """
+    global _client
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=llm_max_connections, max_keepalive_connections=llm_max_connections),
+            timeout=llm_timeout_seconds,
+            transport=local_transport if llm_transport == "local" else None,
+        )
+        _client = AsyncOpenAI(
+            http_client=http_client,
+            max_retries=llm_max_retries,
+            api_key="local" if llm_transport == "local" else None,
+        )
+    return _client
+
+
+def _limit() -> asyncio.Semaphore:
+    # Created on first use so it belongs to the running loop
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(llm_max_concurrency)
+    return _semaphore
+
+
+async def chat(messages: list, temperature: float = 0.2, timeout: float = None, **kwargs) -> str:
+    """
+    Run a chat completion without blocking the event loop and return the reply text.
+    At most llm_max_concurrency calls are in flight per process; the rest wait their turn.
+    """
+    async with _limit():
+        _stats["in_flight"] += 1
+        start = time.perf_counter()
+        try:
+            response = await get_client().chat.completions.create(
+                model=kwargs.pop("model", None) or gpt_model,
+                messages=messages,
+                temperature=temperature,
+                timeout=timeout or llm_timeout_seconds,
+                **kwargs,
+            )
+        except Exception:
+            _stats["errors"] += 1
+            raise
+        finally:
+            _stats["in_flight"] -= 1
+            _stats["calls"] += 1
+            _stats["total_seconds"] += time.perf_counter() - start
+    return response.choices[0].message.content
+
+
+async def stream_chat(messages: list, temperature: float = 0.2, timeout: float = None, **kwargs):
+    """
+    Like chat, but yields the reply text piece by piece as the model produces it.
+    The concurrency slot is held until the stream is finished.
+    """
+    async with _limit():
+        _stats["in_flight"] += 1
+        start = time.perf_counter()
+        try:
+            stream = await get_client().chat.completions.create(
+                model=kwargs.pop("model", None) or gpt_model,
+                messages=messages,
+                temperature=temperature,
+                timeout=timeout or llm_timeout_seconds,
+                stream=True,
+                **kwargs,
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception:
+            _stats["errors"] += 1
+            raise
+        finally:
+            _stats["in_flight"] -= 1
+            _stats["calls"] += 1
+            _stats["total_seconds"] += time.perf_counter() - start
+
+
+def llm_stats() -> dict:
+    return {
+        "calls": _stats["calls"],
+        "errors": _stats["errors"],
+        "in_flight": _stats["in_flight"],
+        "avg_seconds": round(_stats["total_seconds"] / _stats["calls"], 3) if _stats["calls"] else None,
+        "max_concurrency": llm_max_concurrency,
+        "max_connections": llm_max_connections,
+        "transport": llm_transport,
+    }
@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+import numpy as np
+from dotenv import load_dotenv
+from sentence_transformers import SentenceTransformer
+
+load_dotenv()
+
+embedding_model = os.getenv("EMBEDDING_MODEL")
+# torch: plain PyTorch (what the stored embeddings were made with)
+# torch-int8: PyTorch with dynamically quantized Linear layers
+# onnx: ONNX Runtime export of the same weights
+# onnx-int8: ONNX Runtime with a dynamically int8-quantized export
+# The onnx backends need onnxruntime and optimum, which environment.yml leaves out as optional:
+# pip install "sentence-transformers[onnx]"
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+embedding_backend = os.getenv("EMBEDDING_BACKEND", "torch")
+intra_op_threads = int(os.getenv("EMBEDDING_INTRA_OP_THREADS", "0"))  # 0 leaves the runtime default
+onnx_export_dir = os.getenv("EMBEDDING_ONNX_DIR", "model_store/onnx")
+parity_check = os.getenv("EMBEDDING_PARITY_CHECK", "true").lower() == "true"
+parity_tolerance = float(os.getenv("EMBEDDING_PARITY_TOLERANCE", "0.99"))  # minimum cosine similarity
+
+PARITY_TEXTS = [
+    "Provider: The provider is Rogers. Data: The amount of data is 20.0, Promotion Price: 45.0",
+    "Item: CTEXCEL中国电信, Provider: Ctexcel, Roaming: ['cn can'], BYOD/Term: True",
+    "provider: Bell, Telus, Fido roaming: china, united states byod: true target_price: 40",
+    "cheap unlimited data plan",
+]
+
+_model = None
+_lock = threading.Lock()
+# PyTorch embeddings of the parity texts, by text
+_reference = {}
+_reference_lock = threading.Lock()
+_stats = {
+    "model": embedding_model,
+    "backend": embedding_backend,
+    "loaded": False,
+    "load_seconds": None,
+    "rss_before_mb": None,
+    "rss_after_mb": None,
+    "parity": None,
+}
+
+
+def _current_rss_mb():
+    """
+    Resident memory of this process in MB, or None if it can't be read on this platform.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+def _load_onnx(quantized: bool) -> SentenceTransformer:
+    try:
+        import onnxruntime
+        import optimum  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            f"Embedding backend '{embedding_backend}' needs onnxruntime and optimum: "
+            'pip install "sentence-transformers[onnx]"'
+        ) from e
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    session_options = onnxruntime.SessionOptions()
+    if intra_op_threads:
+        session_options.intra_op_num_threads = intra_op_threads
+    model_kwargs = {"provider": "CPUExecutionProvider", "session_options": session_options}
+    if not quantized:
+        return SentenceTransformer(embedding_model, backend="onnx", model_kwargs=model_kwargs)
+
+    quantized_file = "onnx/model_qint8_avx2.onnx"
+    if not os.path.exists(os.path.join(onnx_export_dir, quantized_file)):
+        # Export once from the float ONNX model; later loads reuse the file
+        model = SentenceTransformer(embedding_model, backend="onnx", model_kwargs=model_kwargs)
+        model.save_pretrained(onnx_export_dir)
+        export_dynamic_quantized_onnx_model(model, "avx2", onnx_export_dir)
+    return SentenceTransformer(
+        onnx_export_dir,
+        backend="onnx",
+        model_kwargs={**model_kwargs, "file_name": quantized_file},
+    )
+
+
+def _load(backend: str) -> SentenceTransformer:
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Use one of {', '.join(EMBEDDING_BACKENDS)}.")
+    if backend.startswith("onnx"):
+        return _load_onnx(quantized=backend == "onnx-int8")
+
+    import torch
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    model = SentenceTransformer(embedding_model, device="cpu" if backend == "torch-int8" else None)
+    if backend == "torch-int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def get_model() -> SentenceTransformer:
+    """
+    Return the process-wide embedding model, loading it on first use.
+    """
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                _stats["rss_before_mb"] = _current_rss_mb()
+                start = time.perf_counter()
+                _model = _load(embedding_backend)
+                _stats["load_seconds"] = round(time.perf_counter() - start, 3)
+                _stats["rss_after_mb"] = _current_rss_mb()
+                _stats["loaded"] = True
+                print(f"Loaded embedding model {embedding_model} ({embedding_backend}) in {_stats['load_seconds']}s "
+                      f"(RSS {_stats['rss_before_mb']} -> {_stats['rss_after_mb']} MB)")
+    return _model
+
+
+def _reference_embeddings(texts: list) -> np.ndarray:
+    """
+    PyTorch embeddings of texts. The reference model is loaded only for texts not seen before and
+    released afterwards, so a check doesn't keep a second full model next to the optimized one.
+    """
+    with _reference_lock:
+        missing = [text for text in dict.fromkeys(texts) if text not in _reference]
+        if missing:
+            reference_model = SentenceTransformer(embedding_model)
+            vectors = reference_model.encode(missing, normalize_embeddings=True)
+            _reference.update(zip(missing, vectors))
+            del reference_model
+        return np.array([_reference[text] for text in texts])
+
+
+def check_parity(texts: list = None) -> dict:
+    """
+    Compare the active backend against plain PyTorch. Vectors already stored in phone_plans_db
+    came from PyTorch, so an optimized backend is only usable if it stays within parity_tolerance.
+    """
+    texts = texts or PARITY_TEXTS
+    if embedding_backend == "torch":
+        result = {"backend": "torch", "min_cosine": 1.0, "mean_cosine": 1.0, "tolerance": parity_tolerance, "passed": True}
+    else:
+        reference = _reference_embeddings(texts)
+        candidate = get_model().encode(texts, normalize_embeddings=True)
+        cosines = np.sum(reference * candidate, axis=1)
+        result = {
+            "backend": embedding_backend,
+            "min_cosine": round(float(cosines.min()), 5),
+            "mean_cosine": round(float(cosines.mean()), 5),
+            "tolerance": parity_tolerance,
+            "passed": bool(cosines.min() >= parity_tolerance),
+        }
+    _stats["parity"] = result
+    return result
+
+
+def warm_up():
+    """
+    Load the model ahead of the first request and run one encode so lazy init is paid up front.
+    If the optimized backend fails the parity check, fall back to plain PyTorch.
+    """
+    global _model, embedding_backend
+    get_model().encode(["warm up"])
+    if parity_check and embedding_backend != "torch" and not check_parity()["passed"]:
+        print(f"Embedding backend {embedding_backend} failed parity check {_stats['parity']}, falling back to torch")
+        with _lock:
+            embedding_backend = "torch"
+            _stats["backend"] = "torch"
+            _model = None
+        get_model().encode(["warm up"])
+    return get_model_stats()
+
+
+def get_model_stats() -> dict:
+    stats = dict(_stats)
+    if stats["rss_before_mb"] is not None and stats["rss_after_mb"] is not None:
+        stats["model_rss_mb"] = round(stats["rss_after_mb"] - stats["rss_before_mb"], 1)
+    stats["rss_current_mb"] = _current_rss_mb()
+    return stats
@@ -0,0 +1,176 @@
+import os
+import numpy as np
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models.csv_row import CsvRow
+from backend.services.catalog_snapshot import CatalogSnapshot
+from backend.utils.countries import normalize_roaming
+
+catalog_ttl_seconds = float(os.getenv("PLAN_CATALOG_TTL_SECONDS", "300"))
+
+
+class PlanCatalog(CatalogSnapshot):
+    """
+    Columnar snapshot of phone_plans_db held in NumPy arrays, for answering the structured
+    filters and the vector search in-process.
+
+    Providers are integer codes, roaming is a bitset per row (one bit per distinct
+    roaming_normalized code) and embeddings are one float32 matrix, so a query is a few
+    vectorized masks and one matrix-vector product.
+    """
+
+    name = "plan catalog"
+
+    def __init__(self, dim: int = 384, ttl_seconds: float = 300):
+        super().__init__(ttl_seconds)
+        self.dim = dim
+
+    async def build(self, db: AsyncSession) -> dict:
+        rows = (await db.execute(select(CsvRow).order_by(CsvRow.id))).scalars().all()
+
+        # Lower-cased like the SQL filters compare them
+        providers = sorted({row.provider.lower() for row in rows if row.provider is not None})
+        provider_codes = {name: code for code, name in enumerate(providers)}
+        roaming_values = sorted({value for row in rows for value in (row.roaming_normalized or [])})
+        roaming_bits = {value: bit for bit, value in enumerate(roaming_values)}
+        words = max(1, (len(roaming_values) + 63) // 64)
+
+        roaming = np.zeros((len(rows), words), dtype="uint64")
+        embeddings = np.zeros((len(rows), self.dim), dtype="float32")
+        has_embedding = np.zeros(len(rows), dtype=bool)
+        for i, row in enumerate(rows):
+            for value in row.roaming_normalized or []:
+                bit = roaming_bits[value]
+                roaming[i, bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+            if row.embedding is not None:
+                embeddings[i] = row.embedding
+                has_embedding[i] = True
+
+        return {
+            "plans": [row.to_dict() for row in rows],
+            "price": np.array([np.nan if r.promotion_price is None else r.promotion_price for r in rows], dtype="float64"),
+            "data": np.array([np.nan if r.data is None else r.data for r in rows], dtype="float64"),
+            "provider": np.array([provider_codes.get((r.provider or "").lower(), -1) for r in rows], dtype="int32"),
+            "byod": np.array([r.byod_or_term is True for r in rows], dtype=bool),
+            "roaming": roaming,
+            # NULL roaming fails @> in SQL even for an empty list
+            "has_roaming": np.array([r.roaming_normalized is not None for r in rows], dtype=bool),
+            "roaming_count": np.array([len(r.roaming_normalized or []) for r in rows], dtype="float64"),
+            "embeddings": embeddings,
+            "sq_norms": np.einsum("ij,ij->i", embeddings, embeddings),
+            "has_embedding": has_embedding,
+            "provider_codes": provider_codes,
+            "roaming_bits": roaming_bits,
+        }
+
+    def describe(self, columns: dict) -> dict:
+        return {
+            "plans": len(columns["plans"]),
+            "providers": len(columns["provider_codes"]),
+            "roaming_values": len(columns["roaming_bits"]),
+            "embedded": int(columns["has_embedding"].sum()),
+        }
+
+    @staticmethod
+    def _roaming_mask(columns: dict, values: list) -> np.ndarray:
+        # Row contains every code, like roaming_normalized @> :roaming
+        if any(value not in columns["roaming_bits"] for value in values):
+            return np.zeros(len(columns["price"]), dtype=bool)
+        wanted = np.zeros(columns["roaming"].shape[1], dtype="uint64")
+        for value in values:
+            bit = columns["roaming_bits"][value]
+            wanted[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return columns["has_roaming"] & np.all((columns["roaming"] & wanted) == wanted, axis=1)
+
+    @staticmethod
+    def _provider_mask(columns: dict, excluded: list) -> np.ndarray:
+        # provider NOT IN (...): rows without a provider are excluded too, as in SQL
+        codes = [columns["provider_codes"][p.lower()] for p in excluded if p.lower() in columns["provider_codes"]]
+        return (columns["provider"] >= 0) & ~np.isin(columns["provider"], codes)
+
+    @classmethod
+    def filter_mask(cls, plan_filters: dict, columns: dict) -> np.ndarray:
+        """
+        Rows passing plan_filters, the conditions filters_to_search_prompt puts in SQL.
+        """
+        mask = np.ones(len(columns["price"]), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if plan_filters.get("max_price") is not None:
+                mask &= columns["price"] <= plan_filters["max_price"]
+            if plan_filters.get("min_data") is not None:
+                mask &= columns["data"] >= plan_filters["min_data"]
+        if plan_filters.get("exclude_providers"):
+            mask &= cls._provider_mask(columns, plan_filters["exclude_providers"])
+        if plan_filters.get("roaming"):
+            mask &= cls._roaming_mask(columns, plan_filters["roaming"])
+        return mask
+
+    async def search(self, db: AsyncSession, plan_filters: dict, query_embedding: list, k: int) -> list:
+        """
+        The k nearest plans by L2 distance among those passing the filters.
+        """
+        columns = await self.fresh(db)
+        plans = columns["plans"]
+        candidates = np.flatnonzero(self.filter_mask(plan_filters, columns) & columns["has_embedding"])
+        if not len(candidates):
+            return []
+
+        query = np.asarray(query_embedding, dtype="float32")
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2, so one matrix-vector product covers every candidate
+        sq_distances = columns["sq_norms"][candidates] - 2 * (columns["embeddings"][candidates] @ query) + query @ query
+        distances = np.sqrt(np.maximum(sq_distances, 0))
+        if len(candidates) > k:
+            top = np.argpartition(distances, k)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [{**plans[candidates[i]], "distance": float(distances[i])} for i in top]
+
+    async def match_requirements(self, db: AsyncSession, req, k: int, relax_order: list) -> tuple:
+        """
+        In-memory get_matching_plans: plans meeting req, relaxing fields in relax_order until
+        something matches, ordered by price, then data, then roaming countries.
+        Returns the plans and the relaxed fields, or ([], None) when even full relaxation finds nothing.
+        """
+        columns = await self.fresh(db)
+        plans = columns["plans"]
+        n = len(columns["price"])
+
+        hard = np.ones(n, dtype=bool)
+        if req.roaming:
+            hard &= self._roaming_mask(columns, normalize_roaming(req.roaming))
+        if req.byod is True:
+            hard &= columns["byod"]
+
+        soft = {}
+        with np.errstate(invalid="ignore"):
+            if req.target_price:
+                soft["target_price"] = columns["price"] <= req.target_price * 1.1
+            if req.target_data:
+                soft["target_data"] = columns["data"] >= req.target_data * 0.9
+        if req.current_provider:
+            soft["current_provider"] = self._provider_mask(columns, [req.current_provider.lower()])
+
+        # Lowest tier whose relaxed fields cover everything a row misses
+        tiers = np.full(n, len(relax_order), dtype="int32")
+        for tier in range(len(relax_order) - 1, -1, -1):
+            covered = np.ones(n, dtype=bool)
+            for field, passed in soft.items():
+                if field not in relax_order[tier]:
+                    covered &= passed
+            tiers[covered] = tier
+        tiers[~hard] = len(relax_order)
+
+        if not np.any(tiers < len(relax_order)):
+            return [], None
+        best_tier = int(tiers.min())
+        matched = np.flatnonzero(tiers == best_tier)
+        order = np.lexsort((
+            -columns["roaming_count"][matched],
+            -np.nan_to_num(columns["data"][matched], nan=-np.inf),
+            np.nan_to_num(columns["price"][matched], nan=np.inf),
+        ))
+        return [plans[i] for i in matched[order][:k]], list(relax_order[best_tier])
+
+
+plan_catalog = PlanCatalog(ttl_seconds=catalog_ttl_seconds)
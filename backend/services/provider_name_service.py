@@ -1,7 +1,5 @@
-from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from backend.models.csv_row import CsvRow
+from backend.services.catalog_metadata_service import get_catalog_metadata
 
 async def get_unique_providers(db: AsyncSession):
-    result = await db.execute(select(CsvRow.provider).distinct())
-    return {"providers" : result.scalars().all()}
+    return {"providers" : (await get_catalog_metadata(db))["providers"]}
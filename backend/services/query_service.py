@@ -1,44 +1,56 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
-from sqlalchemy import select, bindparam
-from pgvector.sqlalchemy import Vector
+import os
 import textwrap
 import json
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
 from backend.schemas.query import QueryRequest
 from backend.utils.text_formatter import row_to_text_dict
 from backend.utils.query_filter import filters_to_search_prompt
 from backend.services.provider_name_service import get_unique_providers
 from backend.prompts.prompt_registry import get_prompt
+from backend.services.embedding_service import encode_query
+from backend.services.vector_search_service import search_plans
+from backend.services.llm_cache_service import cache_key, get_cached, set_cached
+from backend.services.llm_client import chat, stream_chat, gpt_model
+from backend.utils.sse import sse_event, plan_payload
+from backend.utils.requirement_parser import parse_query_filters, record_parse
+from backend.utils.plan_ranking import rank_plans, parse_weights
+from backend.utils.context_builder import build_context, count_message_tokens
+
+# Rule-based filters at or above this confidence skip the LLM
+fast_parse_min_confidence = float(os.getenv("FAST_PARSE_MIN_CONFIDENCE", "0.8"))
+# Vector search returns this many times k candidates for rank_plans to order
+ranking_candidate_factor = int(os.getenv("RANKING_CANDIDATE_FACTOR", "4"))
+ranking_weights = parse_weights(os.getenv("RANKING_WEIGHTS", ""))
+# Token budget for the plan table in recommend_plans_response
+context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
 
-load_dotenv()
-
-client = OpenAI()
-embedding_model = os.getenv("EMBEDDING_MODEL")
-gpt_model = os.getenv("GPT_MODEL")
-model = SentenceTransformer(embedding_model)  # same model as used in embedding
 
 async def filter_model(request: QueryRequest, providers: list):
     try:
+        filters, confidence, reasons = parse_query_filters(request.question, providers)
+        if confidence >= fast_parse_min_confidence:
+            record_parse("query_filter", fast_path=True)
+            return filters
+        record_parse("query_filter", fast_path=False)
+        print(f"Fast filter parse not confident ({confidence}: {reasons}), asking the LLM")
+
+        key = cache_key("query_filter", request.question, providers)
+        cached = await get_cached(key)
+        if cached is not None:
+            return cached
+
         prompt = get_prompt("query_filter", user_input=request.question, providers=", ".join(providers))
         
         messages = [{"role": "user", "content": prompt}]
-        response = client.chat.completions.create(
-            model=gpt_model,
-            messages= messages,
-            temperature=0.2,
-            store=True,
-        )
-        string_response = response.choices[0].message.content
+        string_response = await chat(messages, temperature=0.2, store=True)
 
         #await log_response(messages = messages, user_id = request.user_id)
         try:
             filters = json.loads(string_response)
         except json.JSONDecodeError as e:
             raise HTTPException(status_code=500, detail=f"Filter failed: Invalid JSON from model - {e}")
+        await set_cached(key, "query_filter", filters)
         return filters  
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Filter failed: {e}")
@@ -46,68 +58,102 @@ async def filter_model(request: QueryRequest, providers: list):
 
 
 
-async def query_model(db: AsyncSession, request: QueryRequest, k: int = 5, message_history: list = None):
-    try:
-        providers = (await get_unique_providers(db))["providers"]
-        print("Providers: ", providers)
-        filter_model_response = await filter_model(request, providers)
-        print(filter_model_response)
-
-        # Generate prompt and Core filter subquery
-        filtered_prompt, filtered_stmt, filtered_params = filters_to_search_prompt(filter_model_response, providers)
-        print("Filtered Prompt: ", filtered_prompt)
-        print("Filtered SQL: ", str(filtered_stmt))
+async def retrieve_context(db: AsyncSession, request: QueryRequest, k: int = 5) -> dict:
+    """
+    Filter extraction, vector search and ranking: everything query_model does before the answer
+    is generated. k * ranking_candidate_factor nearest plans are ranked and the best request.k kept,
+    so the model only explains an order that is already decided.
+    """
+    providers = (await get_unique_providers(db))["providers"]
+    print("Providers: ", providers)
+    filter_model_response = await filter_model(request, providers)
+    print(filter_model_response)
+
+    # Generate prompt and Core filter subquery
+    filtered_prompt, filtered_stmt, filtered_params, plan_filters = filters_to_search_prompt(filter_model_response, providers)
+    print("Filtered Prompt: ", filtered_prompt)
+    print("Filtered SQL: ", str(filtered_stmt))
+
+    # Vector embedding
+    query_embedding = await encode_query(filtered_prompt)
+
+    candidates = await search_plans(db, filtered_stmt, filtered_params, plan_filters, query_embedding, k * ranking_candidate_factor,
+                                    ef_search=request.ef_search, probes=request.probes)
+
+    if not candidates:
+        raise HTTPException(status_code=404, detail="No results found.")
+    rows = rank_plans(candidates, request.k, request.weights or ranking_weights)
+    context, context_stats = build_context(rows, context_token_budget, gpt_model)
+    print("Context: ", context_stats)
+    # Plans cut to fit the budget aren't shown to the model, so they aren't returned either
+    rows = rows[:context_stats["plans"]]
+    return {"filters": filter_model_response, "filtered_sql": str(filtered_stmt), "rows": rows, "context": context,
+            "context_stats": context_stats}
+
+
+def build_messages(request: QueryRequest, context: str, message_history: list = None):
+    # I use dedent here to just remove the indents from the prompt but keep the new lines
+    # This is just for readability for developers, but the indentation can only complicate the model so I remove it
+    prompt = get_prompt("recommend_plans_response", k=request.k, context=context, question=request.question)
+
+    if not message_history:
+        messages = [{"role": "system", "content": "You are a helpful business assistant. Do not answer anything unless it can be backed up with retrieved knowledge or structured data. If unsure, say 'I don't know based on the available data.' Do not make assumptions, do not hallucinate. Respond in the language you are asked in"},
+                    {"role": "user", "content": prompt}]
+    else:
+        cleaned_history = [{"role": m["role"], "content": m["content"]} for m in message_history if m["content"]]
+        messages = [{"role": "system", "content": "You are a helpful business assistant. Do not answer anything unless it can be backed up with retrieved knowledge or structured data. If unsure, say 'I don't know based on the available data.' Do not make assumptions, do not hallucinate."},
+                    *cleaned_history,
+                    {"role": "user", "content": prompt}]
+    return prompt, messages
 
-        # Vector embedding
-        query_embedding = model.encode([filtered_prompt])[0].tolist()
-
-        filtered_subquery = filtered_stmt.subquery("filtered")
-        order_expr = filtered_subquery.c.embedding.op("<->")(bindparam("embedding", type_=Vector(384)))
-        final_stmt = (
-            select(filtered_subquery)
-            .order_by(order_expr)
-            .limit(bindparam("k"))
-        )
-
-        result = await db.execute(final_stmt, {
-            **filtered_params,
-            "embedding": query_embedding,
-            "k": k
-        })
-        rows = result.mappings().all()
 
-        if not rows:
-            raise HTTPException(status_code=404, detail="No results found.")
-        context = "\n".join([row_to_text_dict(r) for r in rows])
-
-        # I use dedent here to just remove the indents from the prompt but keep the new lines
-        # This is just for readability for developers, but the indentation can only complicate the model so I remove it
-        prompt = get_prompt("recommend_plans_response", k=request.k, context=context, question=request.question)
-
-        if not message_history:
-            messages = [{"role": "system", "content": "You are a helpful business assistant. Do not answer anything unless it can be backed up with retrieved knowledge or structured data. If unsure, say 'I don't know based on the available data.' Do not make assumptions, do not hallucinate. Respond in the language you are asked in"},
-                        {"role": "user", "content": prompt}]
-        else:
-            cleaned_history = [{"role": m["role"], "content": m["content"]} for m in message_history if m["content"]]
-            messages = [{"role": "system", "content": "You are a helpful business assistant. Do not answer anything unless it can be backed up with retrieved knowledge or structured data. If unsure, say 'I don't know based on the available data.' Do not make assumptions, do not hallucinate."},
-                        *cleaned_history,
-                        {"role": "user", "content": prompt}]
-        response = client.chat.completions.create(
-            model=gpt_model,
-            messages=messages,
-            temperature=0.3,
-            store=True,
-        )
-
-        answer = response.choices[0].message.content
+async def query_model(db: AsyncSession, request: QueryRequest, k: int = 5, message_history: list = None):
+    try:
+        retrieval = await retrieve_context(db, request, k)
+        prompt, messages = build_messages(request, retrieval["context"], message_history)
+        prompt_tokens = count_message_tokens(messages, gpt_model)
+        print(f"Prompt tokens: {prompt_tokens}")
+        answer = await chat(messages, temperature=0.3, store=True)
         messages.append({"role": "assistant", "content": answer})
         #await log_response(request.question, prompt, answer, request.user_id)
         #print(str(final_stmt), str(filtered_subquery), filtered_params)
-        return {"answer": answer, "filtered_model": filter_model_response, "filtered_sql": str(filtered_subquery), "context": context, "prompt": prompt, "messages": messages}
+        return {"answer": answer, "filtered_model": retrieval["filters"], "filtered_sql": retrieval["filtered_sql"], "context": retrieval["context"], "prompt": prompt, "messages": messages,
+                "prompt_tokens": prompt_tokens, "context_stats": retrieval["context_stats"]}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {e}")
 
+
+async def stream_answer(retrieval: dict, request: QueryRequest, message_history: list = None, on_complete=None):
+    """
+    Server-sent events for an already retrieved query: the plans, then the answer as it is
+    generated, then a final event with the filters and context. on_complete(answer) runs once
+    the full answer is known.
+    """
+    yield sse_event("plans", [plan_payload(r) for r in retrieval["rows"]])
+    prompt, messages = build_messages(request, retrieval["context"], message_history)
+    parts = []
+    try:
+        async for token in stream_chat(messages, temperature=0.3, store=True):
+            parts.append(token)
+            yield sse_event("token", token)
+    except Exception as e:
+        # Headers are already sent, so the failure has to be reported in-band
+        yield sse_event("error", f"Query failed: {e}")
+        return
+    answer = "".join(parts)
+    if on_complete is not None:
+        await on_complete(answer)
+    yield sse_event("done", {
+        "answer": answer,
+        "filtered_model": retrieval["filters"],
+        "filtered_sql": retrieval["filtered_sql"],
+        "context": retrieval["context"],
+        "prompt": prompt,
+        "prompt_tokens": count_message_tokens(messages, gpt_model),
+        "context_stats": retrieval["context_stats"],
+    })
+
 async def search_query_model(db: AsyncSession, request: QueryRequest, k: int = 5, requirements: list = None):
     try:
         providers = (await get_unique_providers(db))["providers"]
@@ -115,25 +161,13 @@ async def search_query_model(db: AsyncSession, request: QueryRequest, k: int = 5
         #the model needs to have a minimum amount of information to work with, so we check if the user has provided any filters
         
         # Generate prompt and Core filter subquery
-        filtered_prompt, filtered_stmt, filtered_params = filters_to_search_prompt(filter_model_response, providers)
+        filtered_prompt, filtered_stmt, filtered_params, plan_filters = filters_to_search_prompt(filter_model_response, providers)
 
         # Vector embedding
-        query_embedding = model.encode([filtered_prompt])[0].tolist()
-
-        filtered_subquery = filtered_stmt.subquery("filtered")
-        order_expr = filtered_subquery.c.embedding.op("<->")(bindparam("embedding", type_=Vector(384)))
-        final_stmt = (
-            select(filtered_subquery)
-            .order_by(order_expr)
-            .limit(bindparam("k"))
-        )
-
-        result = await db.execute(final_stmt, {
-            **filtered_params,
-            "embedding": query_embedding,
-            "k": k
-        })
-        rows = result.mappings().all()
+        query_embedding = await encode_query(filtered_prompt)
+
+        rows = await search_plans(db, filtered_stmt, filtered_params, plan_filters, query_embedding, k,
+                                  ef_search=request.ef_search, probes=request.probes)
 
         if not rows:
             raise HTTPException(status_code=404, detail="No results found.")
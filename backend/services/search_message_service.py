@@ -6,52 +6,101 @@ from sqlalchemy import select, and_ , func
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
 from backend.services.search_query_service import get_search_results, extract_user_requirements
+from backend.services.autosave_service import requirements_upsert_stmt
+from backend.services.provider_name_service import get_unique_providers
 from backend.models.sales_models import SearchResults
+from backend.utils.stage_pipeline import StagePipeline
+import asyncio
 import json
 from collections import defaultdict
 
 async def process_message(payload: SearchMessageCreate, db: AsyncSession) -> dict:
-    try:
-        user = await get_or_create_user(payload.user_id, db)
-        message = SalesSearchMessage(
+    """
+    Run one sales search turn as a stage graph. The extraction LLM call doesn't touch the
+    database, so it overlaps the user lookup, saving the incoming message and loading the previous
+    requirements. The stages that use db share one session, so they are exclusive and run one
+    at a time in dependency order; saving the merged requirements doesn't overlap the search.
+    """
+
+    async def user_stage():
+        return await get_or_create_user(payload.user_id, db)
+
+    async def incoming_stage(user):
+        return await save_message(SalesSearchMessage(
             search_id=payload.search_id,
             user_id=user.id,
             direction="incoming",
             content=payload.content,
-        )
-        await save_message(message, db)
-        prev_requirements = await get_user_requirements(payload.user_id, payload.search_id, db)
-        new_requirements_dict = await extract_user_requirements(payload.content)
-        merged_requirements = merge_requirements(prev_requirements, new_requirements_dict)
-        response = await get_search_results(db=db, user_input=payload.content, requirements=merged_requirements)
-        await set_user_requirements(payload.user_id, payload.search_id, merged_requirements, db)
-        response_msg = SalesSearchMessage(
+        ), db)
+
+    async def prev_requirements_stage(user):
+        return await get_user_requirements(payload.user_id, payload.search_id, db)
+
+    async def providers_stage():
+        # Cached catalog metadata, so this rarely touches the database
+        return (await get_unique_providers(db))["providers"]
+
+    async def extract_stage(providers):
+        return await extract_user_requirements(payload.content, providers)
+
+    async def merge_stage(prev_requirements, extract):
+        return merge_requirements(prev_requirements, extract)
+
+    async def search_stage(merge):
+        return await get_search_results(db=db, user_input=payload.content, requirements=merge)
+
+    async def save_requirements_stage(merge):
+        return await set_user_requirements(payload.user_id, payload.search_id, merge, db)
+
+    async def outgoing_stage(user, search, incoming):
+        # After the incoming message, so the conversation keeps its order
+        return await save_message(SalesSearchMessage(
             user_id=user.id,
             search_id=payload.search_id,
             direction="outgoing",
-            content=response.followup,
-        )
-        await save_message(response_msg, db)
+            content=search.followup,
+        ), db)
 
+    async def results_stage(user, search, outgoing):
         # Create search results record
         search_results = SearchResults(
-            message_id=response_msg.id,
+            message_id=outgoing.id,
             user_id=user.id,
             search_id=payload.search_id,
-            plans=json.loads(response.model_dump_json())["plans"],
-            followup=response.followup
+            plans=json.loads(search.model_dump_json())["plans"],
+            followup=search.followup
         )
         db.add(search_results)
         await db.flush()
         await db.commit()
         await db.refresh(search_results)
+        return search_results
+
+    pipeline = (
+        StagePipeline()
+        .add("user", user_stage, exclusive=True)
+        .add("providers", providers_stage, exclusive=True)
+        .add("extract", extract_stage, after=("providers",))
+        .add("incoming", incoming_stage, after=("user",), exclusive=True)
+        .add("prev_requirements", prev_requirements_stage, after=("user",), exclusive=True)
+        .add("merge", merge_stage, after=("prev_requirements", "extract"))
+        .add("search", search_stage, after=("merge",), exclusive=True)
+        .add("save_requirements", save_requirements_stage, after=("merge",), exclusive=True)
+        .add("outgoing", outgoing_stage, after=("user", "search", "incoming"), exclusive=True)
+        .add("results", results_stage, after=("user", "search", "outgoing"), exclusive=True)
+    )
+    try:
+        results = await pipeline.run()
+        print("process_message stage timings:", pipeline.timings)
+        response = results["search"]
 
         return {
                 "search_id": payload.search_id,
-                "user_id": user.id,
-                "incoming_message_id": message.id,
-                "outgoing_message_id": response_msg.id,
-                "results": json.loads(response.model_dump_json())
+                "user_id": results["user"].id,
+                "incoming_message_id": results["incoming"].id,
+                "outgoing_message_id": results["outgoing"].id,
+                "results": json.loads(response.model_dump_json()),
+                "timings": pipeline.timings,
             }
 
     except SQLAlchemyError as e:
@@ -119,38 +168,9 @@ async def set_user_requirements(user_id: str, search_id: int, req: UserRequireme
     """
     Upsert the user requirements for a given user ID and search ID.
     """
-    result = await db.execute(
-        select(SalesUserRequirements)
-        .where(
-            and_(
-                SalesUserRequirements.user_id == user_id,
-                SalesUserRequirements.search_id == search_id
-            )
-        )
-    )
-    requirements_row = result.scalar_one_or_none()
-    if requirements_row is None:
-        # Insert new requirements row
-        requirements_row = SalesUserRequirements(
-            user_id=user_id,
-            search_id=search_id,
-            current_provider=req.current_provider,
-            target_price=req.target_price,
-            target_data=req.target_data,
-            min_data_gb=req.min_data_gb,
-            byod=req.byod,
-            roaming=req.roaming
-        )
-        db.add(requirements_row)
-    else:
-        # Update existing row
-        for field in req.__class__.model_fields:
-            value = getattr(req, field, None)
-            if value is not None:
-                setattr(requirements_row, field, value)
-    await db.flush()
+    result = await db.execute(requirements_upsert_stmt(user_id, search_id, req))
+    requirements_row = result.scalar_one()
     await db.commit()
-    await db.refresh(requirements_row)
     return requirements_row
 
 async def get_user_messages(user_id: str, db: AsyncSession):
@@ -1,69 +1,138 @@
-from openai import OpenAI
-import os
 import json
+import os
 from fastapi import HTTPException
-from sqlalchemy import select, and_, bindparam
+from sqlalchemy import select, and_, bindparam, case, literal, func
+from sqlalchemy.dialects.postgresql import ARRAY, VARCHAR
 from backend.models.csv_row import CsvRow
+from backend.utils.countries import normalize_roaming
 from backend.schemas.user_requirements import UserRequirements
 from typing import Optional
 from backend.utils.search_query_utils import generate_followup_question, merge_requirements
 from backend.prompts.prompt_registry import get_prompt
 from backend.utils.text_formatter import row_to_dict
 from backend.schemas.search_results import SearchResults, PlanInfo
-
-
-client = OpenAI()
-gpt_model = os.getenv("GPT_MODEL")
-
-async def get_matching_plans(db, req, k=10) -> list[PlanInfo]:
-    conditions = []
+from backend.services.llm_cache_service import cache_key, get_cached, set_cached
+from backend.services.llm_client import chat
+from backend.utils.requirement_parser import parse_user_requirements, record_parse
+from backend.services.plan_catalog import plan_catalog
+
+# Rule-based extractions at or above this confidence skip the LLM
+fast_parse_min_confidence = float(os.getenv("FAST_PARSE_MIN_CONFIDENCE", "0.8"))
+# sql: match in Postgres; memory: match over the in-process PlanCatalog
+plan_match_backend = os.getenv("PLAN_MATCH_BACKEND", "sql")
+
+
+# Requirements dropped, in order, when nothing matches all of them; roaming and BYOD are never relaxed
+RELAX_ORDER = [
+    (),
+    ("target_price",),
+    ("target_data",),
+    ("current_provider",),
+    ("target_price", "target_data"),
+    ("target_price", "current_provider"),
+    ("target_data", "current_provider"),
+    ("target_price", "target_data", "current_provider"),
+]
+_RELAX_BITS = {"target_price": 1, "target_data": 2, "current_provider": 4}
+
+
+def matching_plans_stmt(req, k=10):
+    """
+    The get_matching_plans query and its bind params: hard conditions in WHERE, each row's
+    relax tier as relax_tier.
+    """
+    hard_conditions = []
+    soft_conditions = {}
     params = {}
 
     if req.target_price:
-        conditions.append(CsvRow.promotion_price <= bindparam("max_price"))
+        soft_conditions["target_price"] = CsvRow.promotion_price <= bindparam("max_price")
         params["max_price"] = req.target_price * 1.1  # slight tolerance
 
     if req.target_data:
-        conditions.append(CsvRow.data >= bindparam("min_data"))
+        soft_conditions["target_data"] = CsvRow.data >= bindparam("min_data")
         params["min_data"] = req.target_data * 0.9  # slight tolerance
 
     if req.current_provider:
-        conditions.append(CsvRow.provider != bindparam("exclude_provider"))
+        soft_conditions["current_provider"] = func.lower(CsvRow.provider) != bindparam("exclude_provider")
         params["exclude_provider"] = req.current_provider.lower()
 
     if req.roaming:
-        conditions.append(CsvRow.roaming.op("@>")(bindparam("roaming")))
-        params["roaming"] = [r.lower() for r in req.roaming]
+        hard_conditions.append(CsvRow.roaming_normalized.op("@>")(bindparam("roaming", type_=ARRAY(VARCHAR))))
+        params["roaming"] = normalize_roaming(req.roaming)
 
     if req.byod is True:
-        conditions.append(CsvRow.byod_or_term == True)
+        hard_conditions.append(CsvRow.byod_or_term == True)
+
+    # Bitmask of the requirements a row misses; NULL columns count as missed, like in a WHERE
+    missed = literal(0)
+    for field, condition in soft_conditions.items():
+        missed = missed + case((condition, 0), else_=_RELAX_BITS[field])
+    tier_by_mask = {sum(_RELAX_BITS[f] for f in fields): tier for tier, fields in enumerate(RELAX_ORDER)}
+    relax_tier = case(tier_by_mask, value=missed).label("relax_tier")
+
+    # Within a tier, the same order rank_plans uses: cheapest, then most data, then most roaming
+    stmt = (
+        select(CsvRow, relax_tier)
+        .where(and_(*hard_conditions))
+        .order_by(
+            relax_tier,
+            CsvRow.promotion_price.asc().nulls_last(),
+            CsvRow.data.desc().nulls_last(),
+            func.cardinality(CsvRow.roaming_normalized).desc().nulls_last(),
+        )
+        .limit(k)
+    )
+    return stmt, params
+
+
+async def get_matching_plans(db, req, k=10):
+    """
+    Plans matching req, relaxing requirements in RELAX_ORDER when nothing matches all of them.
+
+    One query scores every row with the first RELAX_ORDER tier it satisfies and keeps the best
+    tier present, so a search that needs relaxing costs the same single round trip as an exact
+    match. Returns the plans and the fields that had to be relaxed.
+    """
+    if plan_match_backend == "memory":
+        matched, relaxed_fields = await plan_catalog.match_requirements(db, req, k, RELAX_ORDER)
+        if not matched:
+            raise HTTPException(status_code=404, detail="No matching plans found.")
+        return [PlanInfo(**plan) for plan in matched], relaxed_fields
 
-    stmt = select(CsvRow).where(and_(*conditions)).limit(k)
+    stmt, params = matching_plans_stmt(req, k)
     result = await db.execute(stmt.params(**params))
-    rows = result.scalars().all()
-    print(f"rows: {rows}")
-    print([row_to_dict(r) for r in rows])
-    plans = [PlanInfo(**row_to_dict(r)) for r in rows]
-    if not plans:
+    rows = result.all()
+    if not rows:
         raise HTTPException(status_code=404, detail="No matching plans found.")
-    return plans
+    best_tier = rows[0].relax_tier
+    plans = [PlanInfo(**row_to_dict(row.CsvRow)) for row in rows if row.relax_tier == best_tier]
+    print(f"Matched {len(plans)} plans at relax tier {best_tier} {RELAX_ORDER[best_tier]}")
+    return plans, list(RELAX_ORDER[best_tier])
 
 
-async def extract_user_requirements(user_input: str) -> dict:
-    prompt = get_prompt("extract_user_requirements", user_input=user_input)
+async def extract_user_requirements(user_input: str, providers: list = None) -> dict:
+    parsed, confidence, reasons = parse_user_requirements(user_input, providers)
+    if confidence >= fast_parse_min_confidence:
+        record_parse("extract_user_requirements", fast_path=True)
+        return parsed
+    record_parse("extract_user_requirements", fast_path=False)
+    print(f"Fast requirement parse not confident ({confidence}: {reasons}), asking the LLM")
 
-    response = client.chat.completions.create(
-        model=gpt_model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2
-    )
+    key = cache_key("extract_user_requirements", user_input)
+    cached = await get_cached(key)
+    if cached is not None:
+        return cached
+
+    prompt = get_prompt("extract_user_requirements", user_input=user_input)
 
-    raw = response.choices[0].message.content
+    raw = await chat([{"role": "user", "content": prompt}], temperature=0.2)
     print("LLM extraction output:", raw)
 
     try:
         parsed = json.loads(raw)
         print("Parsed extraction:", parsed)
+        await set_cached(key, "extract_user_requirements", parsed)
         return parsed
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=500, detail=f"GPT returned invalid JSON: {e}")
@@ -72,59 +141,25 @@ async def get_search_results(db, user_input: str, requirements: UserRequirements
     # Fetch matching plans
     if not requirements.is_valid():
         return []
-    else:
-        try:
-            matching_plans = await get_matching_plans(db, requirements, k)
-        except HTTPException as e:
-            # Fallback: try relaxing requirements in order: price, then data, then provider
-            relax_fields_order = [
-                ["target_price"],
-                ["target_data"],
-                ["current_provider"],
-                ["target_price", "target_data"],
-                ["target_price", "current_provider"],
-                ["target_data", "current_provider"],
-                ["target_price", "target_data", "current_provider"]
-            ]
-            fallback_found = False
-            relaxed_fields = None
-            for fields in relax_fields_order:
-                relaxed_req = requirements.model_copy()
-                for field in fields:
-                    setattr(relaxed_req, field, None)
-                if relaxed_req.is_valid():
-                    try:
-                        matching_plans = await get_matching_plans(db, relaxed_req, k)
-                        fallback_found = True
-                        relaxed_fields = fields
-                        break
-                    except HTTPException:
-                        continue
-            if not fallback_found:
-                print("[ERROR] Failed in get_matching_plans (even after relaxing):", e)
-                raise e
-            else:
-                missing_fields = requirements.get_missing_fields()
-                print("Missing fields (fallback):", missing_fields)
-                followup_question = f"No exact matches found. We relaxed the following requirement(s) to find similar plans: {', '.join(relaxed_fields)}."
-                followup_question += " " + await generate_followup_question(missing_fields)
-                results = SearchResults(
-                    plans=matching_plans,
-                    followup=followup_question
-                )
-                return results
+    matching_plans, relaxed_fields = await get_matching_plans(db, requirements, k)
+
+    missing_fields = requirements.get_missing_fields()
+    if relaxed_fields:
+        print("Missing fields (fallback):", missing_fields)
+        followup_question = f"No exact matches found. We relaxed the following requirement(s) to find similar plans: {', '.join(relaxed_fields)}."
+        followup_question += " " + await generate_followup_question(missing_fields)
+        return SearchResults(
+            plans=matching_plans,
+            followup=followup_question
+        )
 
     followup_question = None
     # Check for missing fields
-    missing_fields = requirements.get_missing_fields()
     print("Missing fields:", missing_fields)
     if missing_fields:
-        try:
-            followup_question = await generate_followup_question(missing_fields)
-        except HTTPException as e:
-            raise e
+        followup_question = await generate_followup_question(missing_fields)
     results = SearchResults(
         plans=matching_plans,
         followup=followup_question
     )
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,190 @@
+import math
+import os
+import re
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db.session import engine
+
+# hnsw: good recall at any size, builds slower; ivfflat: fast to build, lists are trained on the
+# data present at build time so it is rebuilt after a catalog reload; none: sequential scan
+VECTOR_INDEX_METHODS = ("hnsw", "ivfflat", "none")
+vector_index_method = os.getenv("VECTOR_INDEX_METHOD", "hnsw")
+hnsw_m = int(os.getenv("HNSW_M", "16"))
+hnsw_ef_construction = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+hnsw_ef_search = int(os.getenv("HNSW_EF_SEARCH", "40"))
+ivfflat_lists = int(os.getenv("IVFFLAT_LISTS", "0"))  # 0 sizes lists from the row count
+ivfflat_probes = int(os.getenv("IVFFLAT_PROBES", "1"))
+hnsw_max_scan_tuples = int(os.getenv("HNSW_MAX_SCAN_TUPLES", "20000"))
+# pgvector rejects a larger hnsw.ef_search
+HNSW_MAX_EF_SEARCH = 1000
+
+# Column and operator class searched for each VECTOR_STORAGE_MODE
+INDEXED_COLUMNS = {
+    "full": ("embedding", {"hnsw": "vector_l2_ops", "ivfflat": "vector_l2_ops"}),
+    "halfvec": ("embedding_half", {"hnsw": "halfvec_l2_ops", "ivfflat": "halfvec_l2_ops"}),
+    "binary": ("embedding_bit", {"hnsw": "bit_hamming_ops", "ivfflat": "bit_hamming_ops"}),
+}
+
+# Iterative index scans (hnsw.iterative_scan / ivfflat.iterative_scan) arrived in pgvector 0.8;
+# before that the hnsw. prefix is reserved and setting an unknown hnsw.* GUC is an error
+ITERATIVE_SCAN_MIN_VERSION = (0, 8, 0)
+
+_last_build = {}
+_extension_version = None
+
+
+def index_name(mode: str, method: str) -> str:
+    return f"ix_phone_plans_db_{INDEXED_COLUMNS[mode][0]}_{method}"
+
+
+def _lists_for(row_count: int) -> int:
+    # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above
+    if ivfflat_lists:
+        return ivfflat_lists
+    if row_count > 1_000_000:
+        return int(row_count ** 0.5)
+    return max(1, row_count // 1000)
+
+
+async def ensure_vector_index(mode: str, method: str = None, rebuild: bool = False) -> dict:
+    """
+    Create the ANN index for a storage mode if it's missing, dropping the other method's index
+    on the same column. rebuild=True reindexes an existing one (used for ivfflat after a reload).
+    Runs on its own autocommit connection so it can build CONCURRENTLY without blocking readers.
+    """
+    method = method or vector_index_method
+    if method not in VECTOR_INDEX_METHODS:
+        raise ValueError(f"Unknown vector index method '{method}'.")
+
+    column, opclasses = INDEXED_COLUMNS[mode]
+    start = time.perf_counter()
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for other in ("hnsw", "ivfflat"):
+            if other != method:
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name(mode, other)}"))
+        if method == "none":
+            return {"mode": mode, "method": "none"}
+
+        name = index_name(mode, method)
+        if method == "hnsw":
+            options = f"m = {hnsw_m}, ef_construction = {hnsw_ef_construction}"
+        else:
+            row_count = (await conn.execute(text("SELECT count(*) FROM phone_plans_db"))).scalar()
+            options = f"lists = {_lists_for(row_count)}"
+
+        exists = (await conn.execute(
+            text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {"name": name}
+        )).scalar()
+        if exists and rebuild:
+            await conn.execute(text(f"REINDEX INDEX CONCURRENTLY {name}"))
+        elif not exists:
+            await conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON phone_plans_db "
+                f"USING {method} ({column} {opclasses[method]}) WITH ({options})"
+            ))
+
+    result = {"mode": mode, "method": method, "index": name, "seconds": round(time.perf_counter() - start, 3)}
+    _last_build[name] = result
+    print(f"Vector index ready: {result}")
+    return result
+
+
+async def pgvector_version(db: AsyncSession) -> tuple:
+    """
+    Installed version of the vector extension as a tuple, read once per process.
+    """
+    global _extension_version
+    if _extension_version is None:
+        value = (await db.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))).scalar()
+        _extension_version = tuple(int(part) for part in re.findall(r"\d+", value or "0"))
+    return _extension_version
+
+
+async def supports_iterative_scan(db: AsyncSession) -> bool:
+    return await pgvector_version(db) >= ITERATIVE_SCAN_MIN_VERSION
+
+
+async def apply_search_params(db: AsyncSession, ef_search: int = None, probes: int = None, iterative: bool = False,
+                              max_scan_tuples: int = None):
+    """
+    Set the ANN search knobs for the current transaction only.
+    iterative lets a filtered index scan continue past ef_search/probes until enough rows match.
+    """
+    await db.execute(
+        text("SELECT set_config('hnsw.ef_search', :ef_search, true), set_config('ivfflat.probes', :probes, true)"),
+        {"ef_search": str(ef_search or hnsw_ef_search), "probes": str(probes or ivfflat_probes)},
+    )
+    if iterative:
+        await db.execute(text(
+            "SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true), "
+            "set_config('ivfflat.iterative_scan', 'relaxed_order', true), "
+            "set_config('hnsw.max_scan_tuples', :max_scan_tuples, true)"
+        ), {"max_scan_tuples": str(max(max_scan_tuples or 0, hnsw_max_scan_tuples))})
+
+
+async def _ivfflat_layout(db: AsyncSession, mode: str):
+    # (lists, rows) for the mode's ivfflat index, or None if it isn't there
+    row = (await db.execute(text("""
+        SELECT c.reloptions, t.reltuples
+        FROM pg_class c
+        JOIN pg_index i ON i.indexrelid = c.oid
+        JOIN pg_class t ON t.oid = i.indrelid
+        WHERE c.relname = :name
+    """), {"name": index_name(mode, "ivfflat")})).first()
+    if row is None:
+        return None
+    lists = next((int(opt.split("=", 1)[1]) for opt in row[0] or [] if opt.startswith("lists=")), None)
+    return (lists, max(float(row[1]), 1.0)) if lists else None
+
+
+async def apply_window_params(db: AsyncSession, mode: str, fetch: int, ef_search: int = None,
+                              probes: int = None) -> int:
+    """
+    Set the ANN knobs so an unfiltered index scan can return the fetch nearest rows: ef_search
+    raised to fetch (up to pgvector's limit), probes raised to cover fetch rows, and an iterative
+    scan on top where the extension supports one. Returns how many rows the scan can return, which
+    is less than fetch when neither knob reaches.
+    """
+    iterative = await supports_iterative_scan(db)
+    if vector_index_method == "hnsw":
+        ef_search = min(max(fetch, ef_search or hnsw_ef_search), HNSW_MAX_EF_SEARCH)
+        await apply_search_params(db, ef_search=ef_search, probes=probes, iterative=iterative, max_scan_tuples=fetch)
+        return fetch if iterative else ef_search
+
+    layout = await _ivfflat_layout(db, mode)
+    if layout is not None:
+        lists, rows = layout
+        # Lists hold rows / lists rows on average; probe enough of them for the window
+        probes = min(lists, max(probes or ivfflat_probes, math.ceil(fetch * lists / rows)))
+    await apply_search_params(db, ef_search=ef_search, probes=probes, iterative=iterative, max_scan_tuples=fetch)
+    return fetch
+
+
+async def index_status(db: AsyncSession) -> dict:
+    result = await db.execute(text("""
+        SELECT c.relname AS index, i.indisvalid AS valid, i.indisready AS ready,
+               pg_relation_size(c.oid) AS size_bytes, pg_get_indexdef(c.oid) AS definition
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_am am ON am.oid = c.relam
+        WHERE i.indrelid = 'phone_plans_db'::regclass AND am.amname IN ('hnsw', 'ivfflat')
+    """))
+    indexes = [dict(row) for row in result.mappings().all()]
+    progress = await db.execute(text("""
+        SELECT c.relname AS index, p.phase, p.blocks_done, p.blocks_total, p.tuples_done, p.tuples_total
+        FROM pg_stat_progress_create_index p
+        JOIN pg_class c ON c.oid = p.index_relid
+        WHERE p.relid = 'phone_plans_db'::regclass
+    """))
+    return {
+        "method": vector_index_method,
+        "pgvector_version": ".".join(str(part) for part in await pgvector_version(db)),
+        "iterative_scan": await supports_iterative_scan(db),
+        "ef_search": hnsw_ef_search,
+        "probes": ivfflat_probes,
+        "indexes": indexes,
+        "building": [dict(row) for row in progress.mappings().all()],
+        "last_build": _last_build,
+    }
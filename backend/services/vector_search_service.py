@@ -0,0 +1,205 @@
+import os
+import time
+from sqlalchemy import select, bindparam, cast, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from pgvector.sqlalchemy import Vector, HALFVEC, BIT
+from backend.models.csv_row import CsvRow
+from backend.services.embedding_service import encode_query
+from backend.services.faiss_index_service import plan_index
+from backend.services.plan_catalog import plan_catalog
+from backend.services.vector_index_service import (
+    apply_search_params, apply_window_params, ensure_vector_index, supports_iterative_scan, vector_index_method,
+)
+
+# full: exact L2 over float32 vectors
+# halfvec: candidates by float16 distance, then exact re-rank
+# binary: candidates by Hamming distance over sign bits, then exact re-rank
+VECTOR_STORAGE_MODES = ("full", "halfvec", "binary")
+vector_storage_mode = os.getenv("VECTOR_STORAGE_MODE", "full")
+# pgvector: rank inside Postgres; faiss: rank in this process with FaissPlanIndex;
+# memory: filter and rank in this process over the PlanCatalog arrays
+VECTOR_SEARCH_BACKENDS = ("pgvector", "faiss", "memory")
+vector_search_backend = os.getenv("VECTOR_SEARCH_BACKEND", "pgvector")
+rerank_candidates = int(os.getenv("VECTOR_RERANK_CANDIDATES", "50"))
+# iterative needs pgvector >= 0.8 when an ANN index is in use; see ranked_stmt for the modes.
+# auto picks iterative where the extension supports it and overfetch otherwise
+FILTERED_SEARCH_MODES = ("subquery", "iterative", "overfetch")
+filtered_search_mode = os.getenv("FILTERED_SEARCH_MODE", "auto")
+overfetch_factor = int(os.getenv("OVERFETCH_FACTOR", "10"))
+overfetch_max = int(os.getenv("OVERFETCH_MAX_CANDIDATES", "10000"))
+COMPACT_COLUMNS = ("embedding_half", "embedding_bit")
+
+
+def _output_columns(subquery):
+    # The compact copies are only for ordering; don't ship them back to the app
+    return [c for c in subquery.c if c.name not in COMPACT_COLUMNS]
+
+
+def _distance(columns, mode: str, query_vector):
+    """
+    Distance used to pick candidates: exact for full, the compact column otherwise.
+    """
+    if mode == "full":
+        return columns.embedding.op("<->")(query_vector)
+    if mode == "halfvec":
+        return columns.embedding_half.op("<->")(cast(query_vector, HALFVEC(384)))
+    return columns.embedding_bit.op("<~>")(cast(func.binary_quantize(cast(query_vector, Vector(384))), BIT(384)))
+
+
+def ranked_stmt(filtered_stmt, mode: str = None, filter_mode: str = None):
+    """
+    Order the rows matched by filtered_stmt by distance to :embedding and keep the top :k.
+
+    :candidates rows are picked by _distance and re-ranked by exact distance, which also
+    restores strict order after a relaxed iterative index scan.
+    filter_mode decides which rows the ranking sees:
+    - subquery: only the rows filtered_stmt's own LIMIT kept (the original behaviour)
+    - iterative: all rows passing the filters; the ANN index scan keeps going until enough match
+    - overfetch: the :fetch nearest rows overall, then the filters
+    """
+    mode = mode or vector_storage_mode
+    filter_mode = filter_mode or filtered_search_mode
+    if filter_mode == "auto":
+        filter_mode = "iterative"
+    if mode not in VECTOR_STORAGE_MODES:
+        raise ValueError(f"Unknown vector storage mode '{mode}'.")
+    if filter_mode not in FILTERED_SEARCH_MODES:
+        raise ValueError(f"Unknown filtered search mode '{filter_mode}'.")
+
+    query_vector = bindparam("embedding", type_=Vector(384))
+    if filter_mode == "subquery":
+        filtered = filtered_stmt.subquery("filtered")
+        base, columns = select(filtered), filtered.c
+    else:
+        base, columns = filtered_stmt.limit(None), CsvRow.__table__.c
+        if filter_mode == "overfetch":
+            nearest = select(CsvRow.id).order_by(_distance(columns, mode, query_vector)).limit(bindparam("fetch"))
+            base = base.where(CsvRow.id.in_(nearest))
+
+    candidates = (
+        base
+        .order_by(_distance(columns, mode, query_vector))
+        .limit(bindparam("candidates"))
+        .subquery("candidates")
+    )
+    # Labelled so rows carry the same "distance" the in-process backends report, for rank_plans
+    distance = candidates.c.embedding.op("<->")(query_vector).label("distance")
+    return (
+        select(*_output_columns(candidates), distance)
+        .order_by(distance)
+        .limit(bindparam("k"))
+    )
+
+
+async def resolve_filter_mode(db: AsyncSession, filter_mode: str = None) -> str:
+    """
+    The filtered search mode to run: iterative scans fall back to overfetch on pgvector < 0.8
+    when an ANN index is in use.
+    """
+    filter_mode = filter_mode or filtered_search_mode
+    if filter_mode not in ("auto", "iterative") or vector_index_method == "none":
+        return "iterative" if filter_mode == "auto" else filter_mode
+    if await supports_iterative_scan(db):
+        return "iterative"
+    if filter_mode == "iterative":
+        print("FILTERED_SEARCH_MODE=iterative needs pgvector >= 0.8; using overfetch")
+    return "overfetch"
+
+
+async def exact_search(db: AsyncSession, filtered_stmt, params: dict, mode: str = None) -> list:
+    """
+    Rank every row matching filtered_stmt by exact distance, with ANN index scans switched off
+    for the statement.
+    """
+    await db.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+    rows = (await db.execute(ranked_stmt(filtered_stmt, mode, "iterative"), params)).mappings().all()
+    await db.execute(text("SELECT set_config('enable_indexscan', 'on', true)"))
+    return rows
+
+
+async def search_plans(db: AsyncSession, filtered_stmt, filtered_params: dict, plan_filters: dict,
+                       query_embedding: list, k: int, mode: str = None, backend: str = None,
+                       ef_search: int = None, probes: int = None, filter_mode: str = None):
+    """
+    Run the vector search over the rows matched by filtered_stmt and return the top k as mappings.
+    The in-process backends apply plan_filters, the same conditions as values, instead.
+    ef_search / probes override the ANN index search settings for this query.
+    """
+    backend = backend or vector_search_backend
+    if backend == "faiss":
+        return await plan_index.search(db, plan_filters, query_embedding, k)
+    if backend == "memory":
+        return await plan_catalog.search(db, plan_filters, query_embedding, k)
+    if backend != "pgvector":
+        raise ValueError(f"Unknown vector search backend '{backend}'.")
+
+    mode = mode or vector_storage_mode
+    filter_mode = await resolve_filter_mode(db, filter_mode)
+    indexed = vector_index_method != "none"
+    if indexed and filter_mode != "overfetch":
+        await apply_search_params(db, ef_search, probes, iterative=filter_mode == "iterative")
+    params = {
+        **filtered_params,
+        "embedding": query_embedding,
+        "k": k,
+        "candidates": k if mode == "full" else max(rerank_candidates, k),
+    }
+    stmt = ranked_stmt(filtered_stmt, mode, filter_mode)
+    if filter_mode != "overfetch":
+        return (await db.execute(stmt, params)).mappings().all()
+
+    # Widen the nearest-neighbour window until k rows survive the filters. An index scan only
+    # returns as many rows as ef_search / probes let it, so those are widened with the window.
+    fetch = max(params["candidates"], k) * overfetch_factor
+    while True:
+        reach = await apply_window_params(db, mode, fetch, ef_search, probes) if indexed else fetch
+        rows = (await db.execute(stmt, {**params, "fetch": fetch})).mappings().all()
+        if len(rows) >= k or fetch >= overfetch_max or reach < fetch:
+            break
+        fetch = min(fetch * 4, overfetch_max)
+    if len(rows) >= k:
+        return rows
+
+    # Filters are too selective for the window: rank every matching row exactly
+    return await exact_search(db, filtered_stmt, params, mode)
+
+
+async def compare_storage_modes(db: AsyncSession, queries: list, k: int = 10) -> dict:
+    """
+    Recall@k and mean latency of each storage mode against exact search over the whole catalog.
+    The reference pass scans without the ANN index, so "full" reports the index's own recall.
+    """
+    report = {mode: {"recall": 0.0, "latency_ms": 0.0} for mode in VECTOR_STORAGE_MODES}
+    for query in queries:
+        query_embedding = await encode_query(query)
+        params = {"embedding": query_embedding, "k": k, "candidates": k}
+        exact_ids = {row["id"] for row in await exact_search(db, select(CsvRow), params, "full")}
+        for mode in VECTOR_STORAGE_MODES:
+            start = time.perf_counter()
+            rows = await search_plans(db, select(CsvRow), {}, {}, query_embedding, k, mode, backend="pgvector")
+            report[mode]["latency_ms"] += (time.perf_counter() - start) * 1000
+            ids = {row["id"] for row in rows}
+            report[mode]["recall"] += len(ids & exact_ids) / len(exact_ids) if exact_ids else 1.0
+
+    for stats in report.values():
+        stats["recall"] = round(stats["recall"] / len(queries), 3) if queries else None
+        stats["latency_ms"] = round(stats["latency_ms"] / len(queries), 2) if queries else None
+    return {"k": k, "candidates": max(rerank_candidates, k), "queries": len(queries), "modes": report}
+
+
+async def refresh_after_catalog_change(db: AsyncSession):
+    """
+    Called after a catalog upload so in-process indexes don't serve the old catalog.
+    """
+    if vector_search_backend == "faiss":
+        await plan_index.rebuild(db)
+    if vector_search_backend == "memory" or plan_catalog.snapshot is not None:
+        await plan_catalog.rebuild(db)
+
+
+async def refresh_vector_index(after_reload: bool = True):
+    """
+    Make sure the ANN index for the active storage mode exists. After a catalog reload an
+    ivfflat index is rebuilt, since its lists were trained on the old rows.
+    """
+    await ensure_vector_index(vector_storage_mode, rebuild=after_reload and vector_index_method == "ivfflat")
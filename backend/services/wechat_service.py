@@ -5,7 +5,8 @@ from sqlalchemy.exc import SQLAlchemyError
 from backend.models.wechat_models import WeChatUser, WeChatMessage
 from backend.schemas.query import QueryRequest
 from backend.schemas.message import MessageCreate
-from backend.services.query_service import query_model
+from backend.db.session import AsyncSessionLocal
+from backend.services.query_service import query_model, retrieve_context, stream_answer
 
 async def process_message(payload: MessageCreate, db: AsyncSession) -> dict:
     try:
@@ -38,6 +39,49 @@ async def process_message(payload: MessageCreate, db: AsyncSession) -> dict:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def stream_message(payload: MessageCreate, db: AsyncSession):
+    """
+    process_message for streaming clients. Retrieval happens up front so errors still surface as
+    HTTP errors; the returned generator streams the answer and saves it once it is complete.
+    """
+    try:
+        user = await get_or_create_user(payload.openid, db)
+        user_id = user.id
+        message = WeChatMessage(
+            user_id=user_id,
+            direction=payload.direction,
+            msg_type=payload.msg_type,
+            content=payload.content,
+            msg_id=payload.msg_id
+        )
+        await save_message(message, db)
+        history = await get_wechat_history(payload.openid, db)
+        req = QueryRequest(question=payload.content)
+        retrieval = await retrieve_context(db, req)
+    except HTTPException:
+        await db.rollback()
+        raise
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Database error: " + str(e.orig))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def save_answer(answer: str):
+        # The request's session may already be closed by the time the stream finishes
+        async with AsyncSessionLocal() as session:
+            await save_message(WeChatMessage(
+                user_id=user_id,
+                direction="outgoing",
+                msg_type=payload.msg_type,
+                content=answer,
+                msg_id=payload.msg_id
+            ), session)
+
+    return stream_answer(retrieval, req, message_history=history, on_complete=save_answer)
+
+
 async def get_wechat_history(openid: str, db: AsyncSession):
     result = await db.execute(select(WeChatUser).where(WeChatUser.openid == openid))
     user = result.scalar_one_or_none()
@@ -0,0 +1,42 @@
+from backend.utils.context_builder import CORE_FIELDS, build_context, count_tokens
+
+PLANS = [
+    {"item_name": f"Plan {i}", "provider": "Fido", "promotion_price": 40.0 + i, "data": 10.0 * i,
+     "roaming_normalized": ["US", "MX"], "byod_or_term": True, "original_price": 55.0,
+     "overage_rate": "$10/100MB", "region": "Ontario", "channel": "Online"}
+    for i in range(1, 6)
+]
+
+
+def test_fits_budget_without_dropping():
+    context, summary = build_context(PLANS, budget_tokens=10_000)
+    assert summary["dropped_fields"] == [] and summary["dropped_plans"] == 0
+    assert summary["context_tokens"] == count_tokens(context)
+    assert context.splitlines()[0].startswith("# | Item | Provider | Price | Data GB | Roaming")
+    assert "US/MX" in context
+
+
+def test_empty_columns_left_out():
+    _, summary = build_context(PLANS, budget_tokens=10_000)
+    assert "code" not in summary["fields"] and "tier" not in summary["fields"]
+
+
+def test_drops_least_useful_fields_first():
+    full, _ = build_context(PLANS, budget_tokens=10_000)
+    _, summary = build_context(PLANS, budget_tokens=count_tokens(full) - 20)
+    assert summary["dropped_fields"][0] == "channel"
+    assert summary["dropped_plans"] == 0
+    assert summary["context_tokens"] <= summary["budget_tokens"]
+
+
+def test_core_fields_kept_then_plans_dropped():
+    _, summary = build_context(PLANS, budget_tokens=1)
+    assert summary["fields"] == list(CORE_FIELDS)
+    assert summary["plans"] == 1
+
+
+def test_core_fields_kept_when_one_is_empty():
+    # Without a data column, keeping "the first four" fields would have kept roaming
+    plans = [{**plan, "data": None} for plan in PLANS]
+    _, summary = build_context(plans, budget_tokens=1)
+    assert summary["fields"] == ["item_name", "provider", "promotion_price"]
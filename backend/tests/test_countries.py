@@ -0,0 +1,30 @@
+import pytest
+from backend.utils.countries import country_mentions, normalize_roaming
+
+EUROPE = {"AT", "BE", "CH", "DE", "ES", "FR", "GB", "IT", "NO"}
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["China"], ["CN"]),
+    (["USA", "canada"], ["CA", "US"]),
+    (["中国", "美国"], ["CN", "US"]),
+    (["North America"], ["CA", "MX", "US"]),
+    (["北美"], ["CA", "MX", "US"]),
+    # Filler next to a known place is dropped, not kept as a code
+    (["North America roaming"], ["CA", "MX", "US"]),
+    # Nothing recognised: kept whole so the value still matches itself
+    (["Egypt"], ["egypt"]),
+    (None, None),
+])
+def test_normalize_roaming(values, expected):
+    assert normalize_roaming(values) == expected
+
+
+def test_europe_expands_to_members():
+    assert EUROPE <= set(normalize_roaming(["Europe"]))
+
+
+def test_region_is_not_a_country_mention():
+    # "america" alone means the US, but not inside "south america"
+    assert [country for country, _, _ in country_mentions("roaming in south america")] == []
+    assert [country for country, _, _ in country_mentions("roaming in america")] != []
@@ -0,0 +1,42 @@
+from backend.utils.embedding_cache import EmbeddingCache, normalize_prompt
+
+
+def test_normalize_prompt_whitespace():
+    assert normalize_prompt("  cheap\n plan\t 10GB ") == "cheap plan 10GB"
+    assert normalize_prompt(None) == ""
+
+
+def test_case_kept_unless_casefold():
+    assert normalize_prompt("Rogers Plan") == "Rogers Plan"
+    assert normalize_prompt("Rogers Plan", casefold=True) == "rogers plan"
+
+
+def test_whitespace_variants_share_an_entry():
+    cache = EmbeddingCache(max_entries=4)
+    cache.put("cheap  plan", [1.0])
+    assert cache.get(" cheap plan\n") == [1.0]
+    # A cased model embeds case, so these are different keys
+    assert cache.get("Cheap plan") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_casefold_cache_ignores_case():
+    cache = EmbeddingCache(max_entries=4, casefold=True)
+    cache.put("Cheap Plan", [1.0])
+    assert cache.get("cheap plan") == [1.0]
+
+
+def test_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    cache.get("a")
+    cache.put("c", [3.0])
+    assert cache.get("b") is None
+    assert cache.get("a") == [1.0] and cache.get("c") == [3.0]
+
+
+def test_disabled_when_max_entries_zero():
+    cache = EmbeddingCache(max_entries=0)
+    cache.put("a", [1.0])
+    assert cache.get("a") is None
@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("faiss")
+from backend.services.faiss_index_service import FaissPlanIndex  # noqa: E402
+
+PLANS = {
+    1: {"provider": "Rogers", "promotion_price": 40.0, "data": 10.0, "roaming_normalized": ["US"]},
+    2: {"provider": "Fido", "promotion_price": 35.0, "data": 20.0, "roaming_normalized": ["US", "MX"]},
+    3: {"provider": "Bell", "promotion_price": 60.0, "data": 50.0, "roaming_normalized": None},
+    4: {"provider": None, "promotion_price": None, "data": 5.0, "roaming_normalized": []},
+}
+
+
+@pytest.mark.parametrize("plan_filters, expected", [
+    ({}, None),
+    ({"max_price": 40}, [1, 2]),
+    ({"min_data": 20}, [2, 3]),
+    ({"exclude_providers": ["fido"]}, [1, 3]),
+    ({"roaming": ["US", "MX"]}, [2]),
+    ({"max_price": 30}, []),
+])
+def test_matching_ids(plan_filters, expected):
+    assert FaissPlanIndex.matching_ids(plan_filters, PLANS) == expected
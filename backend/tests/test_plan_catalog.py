@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from backend.models.csv_row import CsvRow
+from backend.schemas.user_requirements import UserRequirements
+from backend.services.catalog_snapshot import CatalogSnapshot
+from backend.services.plan_catalog import PlanCatalog
+from backend.services.search_query_service import RELAX_ORDER
+
+DIM = 4
+
+
+def _row(id, provider, price, data, roaming=None, byod=None, embedding=None):
+    return CsvRow(id=id, item_name=f"Plan {id}", provider=provider, promotion_price=price, data=data,
+                  roaming_normalized=roaming, byod_or_term=byod, embedding=embedding)
+
+
+ROWS = [
+    _row(1, "Rogers", 40.0, 10.0, ["US"], True, [0, 0, 0, 0]),
+    _row(2, "Fido", 35.0, 20.0, ["US", "MX"], True, [1, 0, 0, 0]),
+    _row(3, "Bell", 60.0, 50.0, ["CN"], False, [0, 2, 0, 0]),
+    _row(4, "Fido", 45.0, 20.0, None, None, None),
+    _row(5, None, 30.0, 5.0, [], True, [0, 0, 3, 0]),
+]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    async def execute(self, stmt):
+        return FakeResult(ROWS)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def catalog():
+    catalog = PlanCatalog(dim=DIM)
+    run(catalog.rebuild(FakeSession()))
+    return catalog
+
+
+def test_snapshot_is_abstract():
+    with pytest.raises(TypeError):
+        CatalogSnapshot()
+
+
+def test_build_columns(catalog):
+    assert catalog.stats()["plans"] == 5
+    assert catalog.stats()["providers"] == 3
+    assert catalog.stats()["embedded"] == 4
+
+
+@pytest.mark.parametrize("plan_filters, expected", [
+    ({}, [1, 2, 3, 4, 5]),
+    ({"max_price": 40}, [1, 2, 5]),
+    ({"min_data": 20}, [2, 3, 4]),
+    # Provider names compare lower-cased; rows without a provider fail NOT IN like in SQL
+    ({"exclude_providers": ["fido"]}, [1, 3]),
+    # Contains every code; NULL roaming never matches, an empty list only matches no filter
+    ({"roaming": ["US"]}, [1, 2]),
+    ({"roaming": ["US", "MX"]}, [2]),
+    ({"roaming": ["JP"]}, []),
+])
+def test_filter_mask(catalog, plan_filters, expected):
+    mask = PlanCatalog.filter_mask(plan_filters, catalog.snapshot)
+    assert [plan["id"] for plan, keep in zip(catalog.snapshot["plans"], mask) if keep] == expected
+
+
+def test_search_orders_by_distance(catalog):
+    plans = run(catalog.search(FakeSession(), {}, [0, 0, 0, 0], k=3))
+    assert [p["id"] for p in plans] == [1, 2, 3]
+    assert [p["distance"] for p in plans] == pytest.approx([0.0, 1.0, 2.0])
+    plans = run(catalog.search(FakeSession(), {"max_price": 40}, [0, 0, 3, 0], k=2))
+    assert [p["id"] for p in plans] == [5, 1]
+
+
+def test_match_requirements_without_relaxing(catalog):
+    req = UserRequirements(target_price=40, target_data=10, roaming=["United States"])
+    plans, relaxed = run(catalog.match_requirements(FakeSession(), req, 5, RELAX_ORDER))
+    # Cheapest first
+    assert [p["id"] for p in plans] == [2, 1]
+    assert relaxed == []
+
+
+def test_match_requirements_relaxes_provider(catalog):
+    req = UserRequirements(current_provider="Fido", target_price=40, byod=True, roaming=["Mexico"])
+    plans, relaxed = run(catalog.match_requirements(FakeSession(), req, 5, RELAX_ORDER))
+    assert [p["id"] for p in plans] == [2]
+    assert relaxed == ["current_provider"]
+
+
+def test_match_requirements_never_relaxes_roaming(catalog):
+    req = UserRequirements(target_price=40, roaming=["Japan"])
+    assert run(catalog.match_requirements(FakeSession(), req, 5, RELAX_ORDER)) == ([], None)
@@ -0,0 +1,48 @@
+import pytest
+from backend.utils.plan_ranking import parse_weights, rank_plans
+
+PLANS = [
+    {"id": 1, "promotion_price": 40.0, "data": 10.0, "roaming_normalized": ["US"], "distance": 0.3},
+    {"id": 2, "promotion_price": 35.0, "data": 20.0, "roaming_normalized": [], "distance": 0.9},
+    {"id": 3, "promotion_price": 40.0, "data": 50.0, "roaming_normalized": ["US", "MX"], "distance": 0.5},
+    {"id": 4, "promotion_price": None, "data": 100.0, "roaming_normalized": None, "distance": 0.1},
+    {"id": 5, "promotion_price": 40.0, "data": 50.0, "roaming_normalized": ["US", "MX"], "distance": 0.2},
+]
+
+
+def ids(plans):
+    return [p["id"] for p in plans]
+
+
+def test_parse_weights():
+    assert parse_weights("price=1, data=0.5") == {"price": 1.0, "data": 0.5}
+    assert parse_weights("") == {}
+    assert parse_weights(None) == {}
+
+
+@pytest.mark.parametrize("spec", ["speed=1", "price=cheap"])
+def test_parse_weights_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_weights(spec)
+
+
+def test_lexicographic_order():
+    # Price, then data, then roaming countries, then distance; a missing price ranks last
+    assert ids(rank_plans(PLANS, 5)) == [2, 5, 3, 1, 4]
+    assert ids(rank_plans(PLANS, 2)) == [2, 5]
+    assert rank_plans([], 3) == []
+
+
+def test_weighted_order():
+    assert ids(rank_plans(PLANS, 5, {"distance": 1})) == [4, 5, 1, 3, 2]
+    assert ids(rank_plans(PLANS, 2, {"data": 1})) == [4, 5]
+
+
+def test_weighted_ties_fall_back_to_rule():
+    # 3 and 5 score the same on data; the remaining rule puts the closer one first
+    assert ids(rank_plans(PLANS, 5, {"data": 1}))[1:3] == [5, 3]
+
+
+def test_rank_plans_rejects_unknown_feature():
+    with pytest.raises(ValueError):
+        rank_plans(PLANS, 3, {"speed": 1})
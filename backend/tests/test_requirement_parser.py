@@ -0,0 +1,86 @@
+import pytest
+from backend.utils.requirement_parser import parse_query_filters, parse_user_requirements
+
+# FAST_PARSE_MIN_CONFIDENCE's default
+MIN_CONFIDENCE = 0.8
+
+# (message, filters expected from the fast path or None when it must defer to the LLM)
+SAMPLES = [
+    ("I want a plan with Fido, 10GB for $40",
+     {"preferred_providers": ["Fido"], "target_price": 40.0, "target_data": 10.0}),
+    ("I prefer to go with Telus, $40 for 10GB",
+     {"preferred_providers": ["TELUS"], "target_price": 40.0, "target_data": 10.0}),
+    ("Looking for a plan on Fido, $50 50GB",
+     {"preferred_providers": ["Fido"], "target_price": 50.0, "target_data": 50.0}),
+    ("I'm currently on Rogers, need 20GB under $45",
+     {"exclude_providers": ["Rogers"], "target_price": 45.0, "target_data": 20.0}),
+    ("not Bell, $35 for 15GB",
+     {"exclude_providers": ["Bell"], "target_price": 35.0, "target_data": 15.0}),
+    ("I use Rogers and travel to China, $50 20GB",
+     {"exclude_providers": ["Rogers"], "roaming": ["china"], "target_price": 50.0, "target_data": 20.0}),
+    ("我在用Fido，想要20G，每月40加币",
+     {"exclude_providers": ["Fido"], "target_price": 40.0, "target_data": 20.0}),
+    ("去中国旅游，要30GB $45",
+     {"roaming": ["china"], "target_price": 45.0, "target_data": 30.0}),
+    ("50GB for $40 a month, byod",
+     {"byod": True, "target_price": 40.0, "target_data": 50.0}),
+    # "with"/"on" alone doesn't say whether the provider is current or wanted
+    ("I'm with Rogers, want 10GB for $40", None),
+    # Travel without a country the alias table knows
+    ("$40 10GB, traveling to Egypt", None),
+    ("要去埃及旅游", None),
+    ("going to us next week", None),
+    ("Rogers 10GB $40", None),
+    ("$40 or $50 for 10GB", None),
+    # Negated cues
+    ("Not interested in Rogers, $40 for 10GB",
+     {"exclude_providers": ["Rogers"], "target_price": 40.0, "target_data": 10.0}),
+    ("I'm not looking for Rogers, $40 for 10GB",
+     {"exclude_providers": ["Rogers"], "target_price": 40.0, "target_data": 10.0}),
+    ("我不想用Fido，20G 40加币",
+     {"exclude_providers": ["Fido"], "target_price": 40.0, "target_data": 20.0}),
+    ("I don't need byod, $40 for 10GB", None),
+    ("no roaming needed in China, $40 for 10GB", None),
+    # A destination the alias table doesn't know next to one it does
+    ("going to China and the US, $40 for 10GB", None),
+    ("traveling to Egypt and China, $40 for 10GB", None),
+    ("traveling to Japan and Korea, $50 20GB",
+     {"roaming": ["japan", "south korea"], "target_price": 50.0, "target_data": 20.0}),
+]
+
+# (message, requirements expected from the fast path or None when it must defer to the LLM)
+REQUIREMENT_SAMPLES = [
+    ("I'm currently on Rogers, need 20GB under $45",
+     {"current_provider": "rogers", "target_price": 45.0, "target_data": 20.0}),
+    ("at least 20GB for $50 a month, byod",
+     {"target_price": 50.0, "target_data": 20.0, "min_data_gb": 20.0, "byod": True}),
+    ("我在用Fido，去中国旅游，要30GB 每月45加币",
+     {"current_provider": "fido", "target_price": 45.0, "target_data": 30.0, "roaming": ["china"]}),
+    # UserRequirements can't hold a preferred or excluded provider
+    ("I want a plan with Fido, 10GB for $40", None),
+    ("Not interested in Rogers, $40 for 10GB", None),
+    ("I use Rogers and Bell, $40 for 10GB", None),
+    ("I don't need byod, $40 for 10GB", None),
+    ("no roaming needed in China, $40 for 10GB", None),
+    ("going to China and the US, $40 for 10GB", None),
+]
+
+
+@pytest.mark.parametrize("message, expected", SAMPLES)
+def test_parse_query_filters(message, expected):
+    filters, confidence, reasons = parse_query_filters(message)
+    if expected is None:
+        assert confidence < MIN_CONFIDENCE, (filters, reasons)
+    else:
+        assert confidence >= MIN_CONFIDENCE, reasons
+        assert filters == expected
+
+
+@pytest.mark.parametrize("message, expected", REQUIREMENT_SAMPLES)
+def test_parse_user_requirements(message, expected):
+    requirements, confidence, reasons = parse_user_requirements(message)
+    if expected is None:
+        assert confidence < MIN_CONFIDENCE, (requirements, reasons)
+    else:
+        assert confidence >= MIN_CONFIDENCE, reasons
+        assert requirements == expected
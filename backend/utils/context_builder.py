@@ -0,0 +1,111 @@
+import math
+from functools import lru_cache
+
+# Plan columns in the order they matter for a recommendation; the budget trims from the end
+CONTEXT_FIELDS = [
+    ("item_name", "Item"),
+    ("provider", "Provider"),
+    ("promotion_price", "Price"),
+    ("data", "Data GB"),
+    ("roaming_normalized", "Roaming"),
+    ("byod_or_term", "BYOD"),
+    ("original_price", "Original Price"),
+    ("overage_rate", "Overage"),
+    ("free_ld", "Free LD"),
+    ("activation_fee", "Activation Fee"),
+    ("promo_end_date", "Promo End"),
+    ("region", "Region"),
+    ("line_type", "Line Type"),
+    ("condition", "Condition"),
+    ("channel", "Channel"),
+    ("promo_start_date", "Promo Start"),
+    ("code", "Code"),
+    ("tier", "Tier"),
+]
+# Never dropped to meet the budget
+CORE_FIELDS = ("item_name", "provider", "promotion_price", "data")
+# Rough per-message overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """
+    Tokens in text, counted with tiktoken when it's installed. Otherwise estimated: about four
+    characters per token for ASCII and one token per character for Chinese and other scripts.
+    """
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    ascii_chars = sum(1 for ch in text if ch.isascii())
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def count_message_tokens(messages: list, model: str = None) -> int:
+    return sum(count_tokens(m["content"] or "", model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def _cell(value) -> str:
+    if value is None or value == "" or value == []:
+        return ""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (list, tuple)):
+        return "/".join(str(v) for v in value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _table(plans: list, fields: list) -> str:
+    lines = [" | ".join(["#"] + [header for _, header in fields])]
+    for i, plan in enumerate(plans, start=1):
+        lines.append(" | ".join([str(i)] + [_cell(plan.get(key)) for key, _ in fields]))
+    return "\n".join(lines)
+
+
+def build_context(plans: list, budget_tokens: int, model: str = None):
+    """
+    Render plans as a compact table within budget_tokens.
+
+    Columns that are empty for every plan are left out. If the table is still over budget, the
+    least useful columns are dropped (never CORE_FIELDS), then the lowest-ranked plans.
+    Returns the context and a summary of what was kept.
+    """
+    fields = [(key, header) for key, header in CONTEXT_FIELDS if any(_cell(p.get(key)) for p in plans)]
+    kept_plans = list(plans)
+    dropped_fields = []
+
+    context = _table(kept_plans, fields)
+    tokens = count_tokens(context, model)
+    droppable = [i for i, (key, _) in enumerate(fields) if key not in CORE_FIELDS]
+    while tokens > budget_tokens and droppable:
+        dropped_fields.append(fields.pop(droppable.pop())[0])
+        context = _table(kept_plans, fields)
+        tokens = count_tokens(context, model)
+    while tokens > budget_tokens and len(kept_plans) > 1:
+        kept_plans.pop()
+        context = _table(kept_plans, fields)
+        tokens = count_tokens(context, model)
+
+    return context, {
+        "context_tokens": tokens,
+        "budget_tokens": budget_tokens,
+        "plans": len(kept_plans),
+        "dropped_plans": len(plans) - len(kept_plans),
+        "fields": [key for key, _ in fields],
+        "dropped_fields": dropped_fields,
+    }
@@ -0,0 +1,173 @@
+import re
+
+# Canonical country name (lowercase English, as the filter prompts return them) -> other ways
+# customers write it, in English and Chinese, including a few cities people travel to
+COUNTRY_ALIASES = {
+    "canada": ["canada", "加拿大", "toronto", "vancouver", "montreal", "多伦多", "温哥华", "蒙特利尔"],
+    "united states": ["united states", "usa", "u.s.a", "u.s.", "america", "the states", "美国",
+                      "new york", "las vegas", "los angeles", "seattle", "纽约", "洛杉矶", "拉斯维加斯"],
+    "mexico": ["mexico", "墨西哥", "cancun"],
+    "china": ["china", "mainland china", "prc", "中国", "大陆", "内地", "beijing", "shanghai", "北京", "上海", "广州", "深圳"],
+    "hong kong": ["hong kong", "hongkong", "香港"],
+    "macau": ["macau", "macao", "澳门"],
+    "taiwan": ["taiwan", "台湾", "taipei", "台北"],
+    "japan": ["japan", "日本", "tokyo", "东京"],
+    "south korea": ["south korea", "korea", "韩国", "seoul", "首尔"],
+    "singapore": ["singapore", "新加坡"],
+    "thailand": ["thailand", "泰国", "bangkok"],
+    "vietnam": ["vietnam", "viet nam", "越南"],
+    "philippines": ["philippines", "菲律宾"],
+    "malaysia": ["malaysia", "马来西亚"],
+    "indonesia": ["indonesia", "印尼", "印度尼西亚"],
+    "india": ["india", "印度"],
+    "australia": ["australia", "澳大利亚", "澳洲"],
+    "new zealand": ["new zealand", "新西兰"],
+    "united kingdom": ["united kingdom", "uk", "u.k.", "britain", "england", "英国", "london", "伦敦"],
+    "france": ["france", "法国", "paris", "巴黎"],
+    "germany": ["germany", "德国"],
+    "italy": ["italy", "意大利"],
+    "spain": ["spain", "西班牙"],
+    "portugal": ["portugal", "葡萄牙"],
+    "netherlands": ["netherlands", "holland", "荷兰"],
+    "switzerland": ["switzerland", "瑞士"],
+    "ireland": ["ireland", "爱尔兰"],
+    "brazil": ["brazil", "巴西"],
+    "cuba": ["cuba", "古巴"],
+    "dominican republic": ["dominican republic", "多米尼加"],
+}
+
+# ISO 3166-1 alpha-2 and alpha-3 codes; alpha-2 is what roaming_normalized stores
+ISO_CODES = {
+    "canada": ("CA", "CAN"),
+    "united states": ("US", "USA"),
+    "mexico": ("MX", "MEX"),
+    "china": ("CN", "CHN"),
+    "hong kong": ("HK", "HKG"),
+    "macau": ("MO", "MAC"),
+    "taiwan": ("TW", "TWN"),
+    "japan": ("JP", "JPN"),
+    "south korea": ("KR", "KOR"),
+    "singapore": ("SG", "SGP"),
+    "thailand": ("TH", "THA"),
+    "vietnam": ("VN", "VNM"),
+    "philippines": ("PH", "PHL"),
+    "malaysia": ("MY", "MYS"),
+    "indonesia": ("ID", "IDN"),
+    "india": ("IN", "IND"),
+    "australia": ("AU", "AUS"),
+    "new zealand": ("NZ", "NZL"),
+    "united kingdom": ("GB", "GBR"),
+    "france": ("FR", "FRA"),
+    "germany": ("DE", "DEU"),
+    "italy": ("IT", "ITA"),
+    "spain": ("ES", "ESP"),
+    "portugal": ("PT", "PRT"),
+    "netherlands": ("NL", "NLD"),
+    "switzerland": ("CH", "CHE"),
+    "ireland": ("IE", "IRL"),
+    "brazil": ("BR", "BRA"),
+    "cuba": ("CU", "CUB"),
+    "dominican republic": ("DO", "DOM"),
+}
+# Codes only recognised in structured values (catalog cells, filter lists), never in free text,
+# where "in", "it" or "us" are ordinary words
+_code_lookup = {code.lower(): codes[0] for codes in ISO_CODES.values() for code in codes}
+_code_lookup["uk"] = "GB"
+
+# Regions catalog cells name instead of listing countries -> the ISO alpha-2 codes they cover
+REGIONS = {
+    "north america": (["north america", "北美"], ["CA", "US", "MX"]),
+    "central america": (["central america", "中美洲"], ["BZ", "CR", "SV", "GT", "HN", "NI", "PA"]),
+    "south america": (["south america", "南美"], ["AR", "BO", "BR", "CL", "CO", "EC", "GY", "PY", "PE", "SR", "UY", "VE"]),
+    "europe": (["europe", "eu", "欧洲"], [
+        "AT", "BE", "BG", "HR", "CY", "CZ", "DK", "EE", "FI", "FR", "DE", "GR", "HU", "IE", "IT", "LV", "LT",
+        "LU", "MT", "NL", "PL", "PT", "RO", "SK", "SI", "ES", "SE", "IS", "LI", "NO", "CH", "GB",
+    ]),
+}
+REGIONS["latin america"] = (["latin america", "拉美"], ["MX"] + REGIONS["central america"][1] + REGIONS["south america"][1])
+
+# Names that contain a country alias but aren't about travel there (Chinese carriers), and region
+# names, so "america" in "north america" isn't read as the United States
+NOT_COUNTRIES = ["中国电信", "中国移动", "中国联通"] + [alias for aliases, _ in REGIONS.values() for alias in aliases]
+
+
+def _pattern(alias: str) -> str:
+    # Latin aliases need word boundaries ("uk" in "ukulele"); Chinese has no spaces to anchor on
+    if alias.isascii():
+        return r"(?<![a-z])" + re.escape(alias) + r"(?![a-z])"
+    return re.escape(alias)
+
+
+_alias_patterns = sorted(
+    ((alias, country) for country, aliases in COUNTRY_ALIASES.items() for alias in aliases),
+    key=lambda pair: -len(pair[0]),  # longest first, so "south korea" wins over "korea"
+)
+_alias_regex = re.compile("|".join(_pattern(alias) for alias, _ in _alias_patterns))
+_alias_lookup = {alias: country for alias, country in _alias_patterns}
+
+
+def _mask(text: str, names: list) -> str:
+    # Blank out whole-word occurrences of names, keeping every other offset in place
+    for name in names:
+        text = re.sub(_pattern(name), lambda m: " " * len(m.group(0)), text)
+    return text
+
+
+def country_mentions(text: str) -> list:
+    """
+    (country, start, end) for every country mention in text, in order of appearance. Region names
+    aren't countries and are skipped.
+    """
+    text = _mask(text.lower(), NOT_COUNTRIES)
+    return [(_alias_lookup[m.group(0)], m.start(), m.end()) for m in _alias_regex.finditer(text)]
+
+
+def find_countries(text: str) -> list:
+    """
+    Canonical names of the countries mentioned in text, each once, in the order they first appear.
+    """
+    found = []
+    for country, _, _ in country_mentions(text):
+        if country not in found:
+            found.append(country)
+    return found
+
+
+def normalize_country(value: str) -> list:
+    """
+    ISO alpha-2 codes for one structured roaming value: a code ("CN", "can"), a name in English or
+    Chinese, a region ("North America", "Europe") or several of those separated by spaces
+    ("cn can"). Leftover words next to recognised ones ("only", "zone") are dropped; a value with
+    nothing recognised is kept whole and lowercased so an unknown country isn't silently lost.
+    """
+    value = (value or "").strip().lower()
+    if not value:
+        return []
+    if value in _code_lookup:
+        return [_code_lookup[value]]
+    codes = []
+    masked = value
+    for aliases, region_codes in REGIONS.values():
+        for alias in aliases:
+            if re.search(_pattern(alias), masked):
+                codes.extend(region_codes)
+                masked = _mask(masked, [alias])
+    for country, start, end in country_mentions(masked):
+        codes.append(ISO_CODES[country][0])
+        masked = masked[:start] + " " * (end - start) + masked[end:]
+    for token in re.split(r"[\s,/;|&]+", masked):
+        token = token.strip(".")
+        if token in _code_lookup:
+            codes.append(_code_lookup[token])
+    return codes or [value]
+
+
+def normalize_roaming(values) -> list:
+    """
+    Sorted, de-duplicated ISO codes for a roaming list, or None for no roaming information.
+    """
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = [values]
+    return sorted({code for value in values for code in normalize_country(value)})
@@ -0,0 +1,60 @@
+import re
+import threading
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt: str, casefold: bool = False) -> str:
+    # Tokenizers split on whitespace, so runs of it don't change the vector. Case only doesn't
+    # for uncased models; cased ones (XLM-R based multilingual models) embed it
+    prompt = re.sub(r"\s+", " ", prompt or "").strip()
+    return prompt.lower() if casefold else prompt
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of normalized prompt -> embedding vector.
+    casefold=True also ignores case; only set it for an uncased model.
+    """
+
+    def __init__(self, max_entries: int = 1024, casefold: bool = False):
+        self.max_entries = max_entries
+        self.casefold = casefold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, prompt: str):
+        key = normalize_prompt(prompt, self.casefold)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, prompt: str, vector: list):
+        if self.max_entries <= 0:
+            return
+        key = normalize_prompt(prompt, self.casefold)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
@@ -0,0 +1,57 @@
+import struct
+import numpy as np
+
+# Request:  !I payload_len | !I n_texts | (!I text_len | utf-8 bytes) * n_texts
+# Response: !BII status, n, dim | n * dim little-endian float32
+#           on error status is 1, n is 0 and dim is the length of the utf-8 error message that follows
+STATUS_OK = 0
+STATUS_ERROR = 1
+_U32 = struct.Struct("!I")
+_RESPONSE_HEADER = struct.Struct("!BII")
+
+
+def encode_request(texts: list) -> bytes:
+    parts = [_U32.pack(len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    payload = b"".join(parts)
+    return _U32.pack(len(payload)) + payload
+
+
+async def read_request(reader) -> list:
+    (length,) = _U32.unpack(await reader.readexactly(_U32.size))
+    payload = await reader.readexactly(length)
+    (count,) = _U32.unpack_from(payload, 0)
+    offset = _U32.size
+    texts = []
+    for _ in range(count):
+        (size,) = _U32.unpack_from(payload, offset)
+        offset += _U32.size
+        texts.append(payload[offset:offset + size].decode("utf-8"))
+        offset += size
+    return texts
+
+
+def encode_response(vectors) -> bytes:
+    if len(vectors) == 0:
+        return _RESPONSE_HEADER.pack(STATUS_OK, 0, 0)
+    matrix = np.ascontiguousarray(vectors, dtype="<f4")
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(matrix), -1)
+    return _RESPONSE_HEADER.pack(STATUS_OK, matrix.shape[0], matrix.shape[1]) + matrix.tobytes()
+
+
+def encode_error(message: str) -> bytes:
+    data = message.encode("utf-8")
+    return _RESPONSE_HEADER.pack(STATUS_ERROR, 0, len(data)) + data
+
+
+async def read_response(reader) -> np.ndarray:
+    status, count, dim = _RESPONSE_HEADER.unpack(await reader.readexactly(_RESPONSE_HEADER.size))
+    if status != STATUS_OK:
+        message = (await reader.readexactly(dim)).decode("utf-8")
+        raise RuntimeError(f"Embedding server error: {message}")
+    data = await reader.readexactly(count * dim * 4)
+    return np.frombuffer(data, dtype="<f4").reshape(count, dim)
@@ -0,0 +1,73 @@
+import numpy as np
+
+# Scoring features; each is scaled to 0-1 across the candidates with 1 the most desirable
+RANKING_FEATURES = ("price", "data", "roaming", "distance")
+
+
+def parse_weights(spec: str) -> dict:
+    """
+    "price=1,data=0.5" -> {"price": 1.0, "data": 0.5}. Empty means plain lexicographic ranking.
+    """
+    weights = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in RANKING_FEATURES:
+            raise ValueError(f"Unknown ranking feature '{name}'. Use one of {', '.join(RANKING_FEATURES)}.")
+        weights[name] = float(value)
+    return weights
+
+
+def _column(plans: list, key: str) -> np.ndarray:
+    return np.array([np.nan if p.get(key) is None else float(p[key]) for p in plans], dtype="float64")
+
+
+def _scaled(values: np.ndarray, higher_is_better: bool) -> np.ndarray:
+    # Missing values score as the worst candidate
+    if np.all(np.isnan(values)):
+        return np.zeros(len(values))
+    low, high = np.nanmin(values), np.nanmax(values)
+    scaled = np.zeros(len(values)) if high == low else (values - low) / (high - low)
+    if not higher_is_better:
+        scaled = 1.0 - scaled
+    return np.nan_to_num(scaled, nan=0.0)
+
+
+def rank_plans(plans: list, k: int, weights: dict = None) -> list:
+    """
+    Order candidate plans and return the best k.
+
+    Without weights this is the catalog's rule: lowest promotion price, then most data, then most
+    roaming countries, with vector distance breaking the remaining ties. With weights, plans are
+    ordered by the weighted sum of the scaled features, falling back to that rule on equal scores.
+    """
+    if not plans:
+        return []
+    price = _column(plans, "promotion_price")
+    data = _column(plans, "data")
+    roaming = np.array([len(p.get("roaming_normalized") or p.get("roaming") or []) for p in plans], dtype="float64")
+    distance = _column(plans, "distance")
+
+    # np.lexsort sorts by the last key first; NaNs become the worst value for each key
+    keys = [
+        np.nan_to_num(distance, nan=np.inf),
+        -roaming,
+        -np.nan_to_num(data, nan=-np.inf),
+        np.nan_to_num(price, nan=np.inf),
+    ]
+    if weights:
+        unknown = set(weights) - set(RANKING_FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown ranking feature(s) {', '.join(sorted(unknown))}.")
+        features = {
+            "price": _scaled(price, higher_is_better=False),
+            "data": _scaled(data, higher_is_better=True),
+            "roaming": _scaled(roaming, higher_is_better=True),
+            "distance": _scaled(distance, higher_is_better=False),
+        }
+        score = sum(weight * features[name] for name, weight in weights.items())
+        keys.append(-score)
+    order = np.lexsort(keys)
+    return [plans[i] for i in order[:k]]
@@ -1,17 +1,24 @@
-from sqlalchemy import select, and_, bindparam
+from sqlalchemy import select, and_, bindparam, func
 from sqlalchemy.dialects.postgresql import ARRAY, VARCHAR
 from backend.models.csv_row import CsvRow
+from backend.utils.countries import normalize_roaming
 
 
 def filters_to_search_prompt(filters: dict, providers: list):
+    """
+    The embedding prompt, the filter statement and its bind params for filters from the filter
+    prompt, plus the same conditions as plain values (plan_filters) for the in-process backends.
+    """
     parts = []
-    exclude = set(filters.get("exclude_providers", []))
-    preferred = filters.get("preferred_providers", [])
+    # Catalog providers are compared lower-cased (catalog metadata lists them that way); the
+    # filter prompt may return "Bell"
+    exclude = {p.lower() for p in filters.get("exclude_providers") or []}
+    preferred = [p.lower() for p in filters.get("preferred_providers") or []]
     tolerance = 0.2
     target_price = filters.get("target_price")
     target_data = filters.get("target_data")
     roaming = filters.get("roaming")
-    target_providers = [p for p in providers if p not in exclude]
+    target_providers = [p for p in providers if p.lower() not in exclude]
     if target_providers:
         target_providers += preferred * 2  # soft weight
 
@@ -35,9 +42,9 @@ def filters_to_search_prompt(filters: dict, providers: list):
     if target_data:
         conditions.append(CsvRow.data >= bindparam("min_data"))
     if exclude:
-        conditions.append(CsvRow.provider.not_in([bindparam(f"p{i}") for i in range(len(exclude))]))
+        conditions.append(func.lower(CsvRow.provider).not_in([bindparam(f"p{i}") for i in range(len(exclude))]))
     if roaming:
-        conditions.append(CsvRow.roaming.op("@>")(bindparam("roaming", type_=ARRAY(VARCHAR))))
+        conditions.append(CsvRow.roaming_normalized.op("@>")(bindparam("roaming", type_=ARRAY(VARCHAR))))
 
     stmt = select(CsvRow).where(and_(*conditions)).limit(20)
 
@@ -51,6 +58,12 @@ def filters_to_search_prompt(filters: dict, providers: list):
         for i, p in enumerate(exclude):
             params[f"p{i}"] = p.lower()
     if roaming:
-        params["roaming"] = [r.lower() for r in roaming]
+        params["roaming"] = normalize_roaming(roaming)
 
-    return " ".join(parts), stmt, params
+    plan_filters = {
+        "max_price": params.get("max_price"),
+        "min_data": params.get("min_data"),
+        "exclude_providers": sorted(exclude),
+        "roaming": params.get("roaming") or [],
+    }
+    return " ".join(parts), stmt, params, plan_filters
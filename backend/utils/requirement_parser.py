@@ -0,0 +1,253 @@
+import re
+import threading
+from backend.utils.countries import country_mentions
+
+# Used when the caller doesn't pass the catalog's provider list
+KNOWN_PROVIDERS = [
+    "Bell", "Rogers", "TELUS", "Fido", "Koodo", "Virgin", "Freedom", "Chatr",
+    "Public Mobile", "Lucky", "Videotron", "Ctexcel", "Phonebox",
+]
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_PRICE_RES = [
+    re.compile(r"(?:\$|cad\s*|usd\s*)\s*" + _NUMBER),
+    re.compile(_NUMBER + r"\s*(?:dollars?|bucks|cad|usd|元|块|刀|加币|/\s*mo(?:nth)?\b|a month|per month|每月)"),
+]
+_DATA_RE = re.compile(_NUMBER + r"\s*(?:个\s*)?(tb|gb|gigs?|g|mb)(?![a-z])")
+_DATA_UNITS = {"tb": 1024.0, "gb": 1.0, "gig": 1.0, "gigs": 1.0, "g": 1.0, "mb": 1 / 1024}
+
+# Cues are matched in the clause just before a mention; the closest one decides its role
+_PROVIDER_CUES = [
+    ("excluded", r"\bnot\b|\bno\b|don'?t want|\bexcept\b|\bavoid\b|other than|\bhate\b|不要|除了|不想"),
+    ("current", r"\busing\b|\buse\b|currently|\bhave\b|\bfrom\b|\bleav(?:e|ing)\b|在用|用的是|现在是|现在用"),
+    ("preferred", r"\bwant\b|\bprefer\b|switch to|move to|\bgo(?:ing)? with\b|looking for|interested in|想要|换到|想用|喜欢"),
+]
+# "I'm with Rogers" is the current carrier but "a plan with Fido" is the one wanted, so these only
+# decide a role when the clause has no other cue, and then as a guess
+_AMBIGUOUS_CUES = re.compile(r"\bwith\b|\bon\b")
+_CLAUSE_BREAK = re.compile(r"[,;!?，。；！？]|\.(?!\d)")
+# A negation at most two words before a cue, with no "and"/"but" in between, flips it:
+# "not interested in Rogers", "don't need byod", "no roaming", "不想用"
+_NEGATED = re.compile(
+    r"(?:\b(?:not|no|never|without|dont|doesnt|didnt|isnt|wont|cant|\w+n't)\b"
+    r"(?:\s+(?!and\b|but\b|or\b)[a-z']+){0,2}|[不没别]\w?)\s*$"
+)
+_MIN_DATA_CUES = re.compile(r"at least|minimum|\bmin\b|more than|\bover\b|至少|不少于")
+_BYOD_CUES = re.compile(r"\bbyod\b|bring your own|own (?:phone|device)|no contract|no term|自带手机|自带设备|无合约|不要合约")
+_DEVICE_CUES = re.compile(r"new phone|need a phone|with a phone|phone included|\bfinanc|合约机|要手机")
+_TRAVEL_CUES = re.compile(r"roam|travel|\btrip\b|visit|going to|vacation|holiday|business|abroad|漫游|出差|旅游|旅行|回国|去")
+# Places a destination is expected: right after "travel to", "going to", "visit", "去", and after a
+# country followed by "and"/"or"/"、". A country mention must start where these end. Commas end a
+# clause as often as they continue a list, so they don't count
+_DESTINATION_SLOTS = re.compile(
+    r"(?:\b(?:travel(?:l?ing)?|trip|going|go|fly(?:ing)?|roaming)\s+(?:to|in)|\bvisit(?:ing)?|去|到)\s*(?:the\s+)?"
+)
+_LIST_SLOT = re.compile(r"\s*(?:、|&|\band\b|\bor\b|和|及)\s*(?:the\s+)?")
+_UNLIMITED_CUES = re.compile(r"unlimited|无限")
+_REFERENCE_CUES = re.compile(r"similar|same as|like my|comparable|类似|一样")
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def _provider_pattern(name: str):
+    name = re.escape(name.lower())
+    return re.compile(r"(?<![a-z])" + name + r"(?![a-z])" if name.isascii() else name)
+
+
+def _negated(text: str, pos: int) -> bool:
+    # Is the cue starting at pos negated within its clause?
+    return bool(_NEGATED.search(_CLAUSE_BREAK.split(text[:pos])[-1]))
+
+
+def _role(window: str):
+    """
+    Role from the cues in the last clause of window, and whether it was only guessed from "with"/"on".
+    A negated cue excludes the provider; for a negated "use"/"have" that is itself a guess.
+    """
+    clause = _CLAUSE_BREAK.split(window)[-1]
+    best, best_start, best_end = None, 0, -1
+    for role, pattern in _PROVIDER_CUES:
+        for match in re.finditer(pattern, clause):
+            if match.end() > best_end:
+                best, best_start, best_end = role, match.start(), match.end()
+    guessed = False
+    if best is None:
+        ambiguous = list(_AMBIGUOUS_CUES.finditer(clause))
+        if not ambiguous:
+            return None, False
+        best, best_start, guessed = "current", ambiguous[-1].start(), True
+    if best != "excluded" and _negated(clause, best_start):
+        return "excluded", guessed or best == "current"
+    return best, guessed
+
+
+def _overlaps(span, spans) -> bool:
+    return any(span[0] < end and start < span[1] for start, end in spans)
+
+
+def extract(text: str, providers: list = None) -> dict:
+    """
+    Rule-based pass over a customer message: prices, data amounts, providers by role, countries and
+    BYOD. reasons lists (why, penalty) for everything that makes the result less trustworthy.
+    """
+    lowered = (text or "").lower()
+    found = {"prices": [], "data": [], "min_data": None, "current": [], "preferred": [], "excluded": [],
+             "roaming": [], "byod": None, "reasons": []}
+    reasons = found["reasons"]
+    consumed = []
+
+    mentions = []
+    for name in providers or KNOWN_PROVIDERS:
+        for match in _provider_pattern(name).finditer(lowered):
+            mentions.append((match.start(), match.end(), name))
+    mentions.sort()
+    previous_end = 0
+    for start, end, name in mentions:
+        if _overlaps((start, end), consumed):
+            continue
+        window = lowered[max(previous_end, start - 40):start]
+        role, guessed = _role(window)
+        if role is None:
+            reasons.append((f"no role for provider {name}", 0.3))
+            role = "current"
+        elif guessed:
+            reasons.append((f"ambiguous role for provider {name}", 0.3))
+        if name not in found[role]:
+            found[role].append(name)
+        consumed.append((start, end))
+        previous_end = end
+
+    for pattern in _PRICE_RES:
+        for match in pattern.finditer(lowered):
+            if not _overlaps(match.span(), consumed):
+                found["prices"].append(float(match.group(1)))
+                consumed.append(match.span())
+    for match in _DATA_RE.finditer(lowered):
+        if _overlaps(match.span(), consumed):
+            continue
+        consumed.append(match.span())
+        if match.group(2) == "g" and match.group(1) in ("3", "4", "5"):
+            continue  # 4G/5G is the network, not an amount of data
+        amount = round(float(match.group(1)) * _DATA_UNITS[match.group(2)], 3)
+        found["data"].append(amount)
+        if _MIN_DATA_CUES.search(lowered[max(0, match.start() - 20):match.start()]) or "以上" in lowered[match.end():match.end() + 3]:
+            found["min_data"] = amount
+
+    country_starts, country_ends = set(), []
+    for country, start, end in country_mentions(lowered):
+        if _overlaps((start, end), consumed):
+            continue
+        consumed.append((start, end))
+        country_starts.add(start)
+        country_ends.append(end)
+        if country not in found["roaming"]:
+            found["roaming"].append(country)
+    travel = list(_TRAVEL_CUES.finditer(lowered))
+    if any(_negated(lowered, match.start()) for match in travel):
+        # "no roaming needed in China": the countries aren't requirements
+        found["roaming"] = []
+        reasons.append(("negated travel or roaming", 0.5))
+    elif found["roaming"] and not travel:
+        reasons.append(("countries without a travel cue", 0.3))
+    elif travel and not found["roaming"]:
+        # Somewhere the alias table doesn't know, or no place named at all
+        reasons.append(("travel cue without a known country", 0.3))
+    else:
+        slots = [m.end() for m in _DESTINATION_SLOTS.finditer(lowered)]
+        slots += [m.end() for end in country_ends for m in [_LIST_SLOT.match(lowered, end)] if m and m.end() > end]
+        if any(slot not in country_starts and slot < len(lowered) for slot in slots):
+            # "going to China and the US": "us" isn't a country in free text, so one is missing
+            reasons.append(("destination that isn't a known country", 0.3))
+
+    for match in _BYOD_CUES.finditer(lowered):
+        if _negated(lowered, match.start()):
+            found["byod"] = None
+            reasons.append(("negated byod", 0.5))
+            break
+        found["byod"] = True
+    if _DEVICE_CUES.search(lowered):
+        reasons.append(("device or financing mentioned", 0.3))
+
+    if len(set(found["prices"])) > 1:
+        reasons.append(("several prices", 0.4))
+    if len(set(found["data"])) > 1:
+        reasons.append(("several data amounts", 0.4))
+    if _UNLIMITED_CUES.search(lowered):
+        reasons.append(("unlimited data", 0.3))
+    if _REFERENCE_CUES.search(lowered):
+        reasons.append(("refers to another plan", 0.5))
+    leftover = [m for m in re.finditer(_NUMBER, lowered) if not _overlaps(m.span(), consumed)]
+    if leftover:
+        reasons.append((f"{len(leftover)} unexplained number(s)", 0.4 * len(leftover)))
+    return found
+
+
+def _confidence(fields: dict, reasons: list) -> float:
+    if not fields:
+        # Nothing recognised; the LLM may still find intent in it
+        return 0.0
+    return round(max(0.0, 1.0 - sum(penalty for _, penalty in reasons)), 2)
+
+
+def parse_query_filters(text: str, providers: list = None):
+    """
+    Filters in the shape the query_filter prompt returns, with a 0-1 confidence and the reasons it fell short.
+    """
+    found = extract(text, providers)
+    reasons = list(found["reasons"])
+    filters = {}
+    if found["current"] or found["excluded"]:
+        filters["exclude_providers"] = found["current"] + [p for p in found["excluded"] if p not in found["current"]]
+    if found["preferred"]:
+        filters["preferred_providers"] = found["preferred"]
+    if found["roaming"]:
+        filters["roaming"] = found["roaming"]
+    if found["byod"]:
+        filters["byod"] = True
+    if found["prices"]:
+        filters["target_price"] = found["prices"][0]
+    if found["data"]:
+        filters["target_data"] = found["data"][0]
+    return filters, _confidence(filters, reasons), [why for why, _ in reasons]
+
+
+def parse_user_requirements(text: str, providers: list = None):
+    """
+    Requirements in the shape the extract_user_requirements prompt returns, with a confidence and reasons.
+    """
+    found = extract(text, providers)
+    reasons = list(found["reasons"])
+    requirements = {}
+    if len(found["current"]) > 1:
+        reasons.append(("several current providers", 0.4))
+    if found["preferred"] or found["excluded"]:
+        # UserRequirements has nowhere to put these
+        reasons.append(("provider preference", 0.3))
+    if found["current"]:
+        requirements["current_provider"] = found["current"][0].lower()
+    if found["prices"]:
+        requirements["target_price"] = found["prices"][0]
+    if found["data"]:
+        requirements["target_data"] = found["data"][0]
+    if found["min_data"] is not None:
+        requirements["min_data_gb"] = found["min_data"]
+    if found["roaming"]:
+        requirements["roaming"] = found["roaming"]
+    if found["byod"]:
+        requirements["byod"] = True
+    return requirements, _confidence(requirements, reasons), [why for why, _ in reasons]
+
+
+def record_parse(kind: str, fast_path: bool):
+    with _lock:
+        counts = _stats.setdefault(kind, {"fast_path": 0, "llm": 0})
+        counts["fast_path" if fast_path else "llm"] += 1
+
+
+def parser_stats() -> dict:
+    with _lock:
+        return {
+            kind: {**counts, "hit_rate": round(counts["fast_path"] / (counts["fast_path"] + counts["llm"]), 3)}
+            for kind, counts in _stats.items()
+        }
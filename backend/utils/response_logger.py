@@ -1,12 +1,10 @@
-from openai import OpenAI
 import uuid
-
-client = OpenAI()
+from backend.services.llm_client import get_client
 
 async def log_response(messages, filters, gpt_response, user_id="anonymous"):
     try:
         # Submit to Responses API
-        response_log = client.responses.create(
+        response_log = await get_client().responses.create(
             run_id=str(uuid.uuid4()),  # unique identifier per query
             messages=messages,
             metadata={
@@ -1,10 +1,6 @@
-from openai import OpenAI
-import os
 from backend.schemas.user_requirements import UserRequirements
 from backend.prompts.prompt_registry import get_prompt
-
-client = OpenAI()
-gpt_model = os.getenv("GPT_MODEL")
+from backend.services.llm_client import chat
 
 def merge_requirements(existing: UserRequirements, new: dict) -> UserRequirements:
     existing = UserRequirements(**new)
@@ -14,10 +10,6 @@ def merge_requirements(existing: UserRequirements, new: dict) -> UserRequirement
 async def generate_followup_question(missing_fields: list[str]) -> str:
     prompt = get_prompt("clarify_missing", fields=", ".join(missing_fields))
 
-    response = client.chat.completions.create(
-        model=gpt_model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3
-    )
+    response = await chat([{"role": "user", "content": prompt}], temperature=0.3)
 
-    return response.choices[0].message.content.strip()
\ No newline at end of file
+    return response.strip()
\ No newline at end of file
@@ -0,0 +1,13 @@
+import json
+
+
+def sse_event(event: str, data) -> str:
+    """
+    One server-sent event. data is JSON encoded, so multi-line text stays on one data: line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+
+
+def plan_payload(row) -> dict:
+    # Vectors are only for ranking; dates and the like go out via json default=str
+    return {k: v for k, v in dict(row).items() if k not in ("embedding", "embedding_half", "embedding_bit")}
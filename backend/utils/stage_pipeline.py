@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+
+class StagePipeline:
+    """
+    Runs async stages as a dependency graph: each stage starts as soon as the stages it depends
+    on have finished, so independent stages overlap. A stage is called with its dependencies'
+    results as keyword arguments, named after those stages.
+
+    Exclusive stages run one at a time, for stages sharing something that can't be used
+    concurrently such as one AsyncSession. When a stage fails the others are cancelled, except
+    an exclusive stage that is already running: it finishes, so a statement isn't cut off halfway.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.timings = {}
+
+    def add(self, name: str, fn, after: tuple = (), exclusive: bool = False):
+        for dep in after:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'.")
+        self.stages[name] = (fn, tuple(after), exclusive)
+        return self
+
+    async def run(self) -> dict:
+        start = time.perf_counter()
+        tasks = {}
+        exclusive_lock = asyncio.Lock()
+        state = {"failed": False, "running": None}
+
+        async def timed(name, fn, inputs):
+            began = time.perf_counter()
+            try:
+                return await fn(**inputs)
+            finally:
+                self.timings[name] = {
+                    "start_ms": round((began - start) * 1000, 1),
+                    "duration_ms": round((time.perf_counter() - began) * 1000, 1),
+                }
+
+        async def run_stage(name):
+            fn, after, exclusive = self.stages[name]
+            # Shielded: cancelling a stage that awaits a task would cancel that task too
+            inputs = {dep: await asyncio.shield(tasks[dep]) for dep in after}
+            if not exclusive:
+                return await timed(name, fn, inputs)
+            async with exclusive_lock:
+                if state["failed"]:
+                    raise asyncio.CancelledError()
+                state["running"] = name
+                try:
+                    return await timed(name, fn, inputs)
+                finally:
+                    state["running"] = None
+
+        # Every task exists before any of them runs, so a stage can always await its dependencies
+        for name in self.stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+        try:
+            # wait() rather than gather(): cancelling run() must not cancel the stages directly
+            done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        except BaseException:
+            state["failed"] = True
+            for name, task in tasks.items():
+                if name != state["running"]:
+                    task.cancel()
+            # Let the running exclusive stage finish, and collect the rest so none of their
+            # errors go unretrieved
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self.timings["total"] = {"start_ms": 0.0, "duration_ms": round((time.perf_counter() - start) * 1000, 1)}
+        return {name: task.result() for name, task in tasks.items()}